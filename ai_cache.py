@@ -0,0 +1,164 @@
+# ai_cache.py (Two-tier cache for AI invoice extraction)
+import os
+import json
+import threading
+import logging
+from collections import OrderedDict
+from hashlib import blake2b
+from typing import Dict, Any, Optional
+from config import settings
+
+logger = logging.getLogger("AICache")
+
+
+class AIResponseCache:
+    """
+    Two-tier cache in front of the LLM call:
+    1. Exact tier: blake2b digest of the OCR text -> parsed result (LRU).
+    2. Semantic tier: sentence-transformer embeddings in a FAISS
+       inner-product index. Near-duplicate invoices (same vendor template,
+       different dates/numbers) hit above the similarity threshold and
+       skip the API round-trip entirely.
+
+    The semantic tier is optional: if faiss/sentence-transformers are
+    unavailable or model download fails, the cache degrades to exact
+    matching only.
+    """
+
+    EMBEDDING_DIM = 384  # all-MiniLM-L6-v2
+    # Rewrite the on-disk index/results every N semantic inserts instead
+    # of per insert; a crash loses at most the last batch of a cache
+    PERSIST_EVERY = 32
+
+    def __init__(self, max_size: int = None, similarity_threshold: float = None):
+        self.max_size = max_size or settings.ai_cache_size
+        self.similarity_threshold = similarity_threshold or settings.ai_cache_similarity
+        self._lock = threading.Lock()
+        self._exact: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._embedder = None
+        self._index = None
+        self._semantic_results = []
+        self._semantic_embeddings = []
+        self._dirty = 0
+        self._index_path = os.path.join(settings.model_cache_dir, "ai_cache.faiss")
+        self._results_path = os.path.join(settings.model_cache_dir, "ai_cache_results.json")
+        self._init_semantic()
+
+    def _init_semantic(self):
+        """Initialize the embedding model and FAISS index (best-effort)"""
+        try:
+            import faiss
+            from sentence_transformers import SentenceTransformer
+
+            self._faiss = faiss
+            self._embedder = SentenceTransformer(
+                "all-MiniLM-L6-v2",
+                cache_folder=os.path.join(settings.model_cache_dir, "sentence_transformers")
+            )
+            if os.path.exists(self._index_path) and os.path.exists(self._results_path):
+                self._index = faiss.read_index(self._index_path)
+                with open(self._results_path, "r") as f:
+                    self._semantic_results = json.load(f)
+                if self._index.ntotal:
+                    # Keep raw vectors around so the tier can be rebuilt
+                    # when it is trimmed back to max_size
+                    self._semantic_embeddings = list(
+                        self._index.reconstruct_n(0, self._index.ntotal)
+                    )
+                logger.info(f"Loaded semantic cache with {self._index.ntotal} entries")
+            else:
+                self._index = faiss.IndexFlatIP(self.EMBEDDING_DIM)
+            logger.info("Semantic cache tier initialized")
+        except Exception as e:
+            logger.warning(f"Semantic cache tier disabled: {str(e)}")
+            self._embedder = None
+            self._index = None
+
+    @staticmethod
+    def _digest(text: str) -> str:
+        return blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+    def _embed(self, text: str):
+        import numpy as np
+        embedding = self._embedder.encode([text], normalize_embeddings=True)
+        return np.asarray(embedding, dtype="float32")
+
+    def get(self, ocr_text: str) -> Optional[Dict[str, Any]]:
+        """Exact-hash lookup first, then semantic similarity"""
+        key = self._digest(ocr_text)
+        with self._lock:
+            if key in self._exact:
+                self._exact.move_to_end(key)
+                logger.info("AI cache hit (exact)")
+                return self._exact[key]
+
+        if self._index is not None and self._index.ntotal > 0:
+            try:
+                embedding = self._embed(ocr_text)
+                # Search under the lock: a concurrent put may swap the
+                # index during a trim, and vector ids are only valid
+                # against the results list from the same moment
+                with self._lock:
+                    scores, indices = self._index.search(embedding, 1)
+                    if scores[0][0] >= self.similarity_threshold:
+                        logger.info(f"AI cache hit (semantic, score={scores[0][0]:.3f})")
+                        return self._semantic_results[int(indices[0][0])]
+            except Exception as e:
+                logger.debug(f"Semantic cache lookup failed: {str(e)}")
+        return None
+
+    def put(self, ocr_text: str, result: Dict[str, Any]):
+        key = self._digest(ocr_text)
+        with self._lock:
+            self._exact[key] = result
+            self._exact.move_to_end(key)
+            while len(self._exact) > self.max_size:
+                self._exact.popitem(last=False)
+
+        if self._index is not None:
+            try:
+                import numpy as np
+
+                # Embedding outside the lock (model inference is the
+                # slow part); every index/results mutation inside it, so
+                # concurrent puts cannot misalign FAISS vector ids with
+                # the results list
+                embedding = self._embed(ocr_text)
+                with self._lock:
+                    self._index.add(embedding)
+                    self._semantic_results.append(result)
+                    self._semantic_embeddings.append(embedding[0])
+                    if len(self._semantic_results) > self.max_size:
+                        # Trim to the newest half and rebuild; IndexFlatIP
+                        # has no cheap removal, and halving amortizes the
+                        # rebuild instead of paying it per insert
+                        keep = self.max_size // 2
+                        self._semantic_results = self._semantic_results[-keep:]
+                        self._semantic_embeddings = self._semantic_embeddings[-keep:]
+                        index = self._faiss.IndexFlatIP(self.EMBEDDING_DIM)
+                        index.add(np.vstack(self._semantic_embeddings))
+                        self._index = index
+                    self._dirty += 1
+                    if self._dirty >= self.PERSIST_EVERY:
+                        self._persist()
+                        self._dirty = 0
+            except Exception as e:
+                logger.debug(f"Semantic cache insert failed: {str(e)}")
+
+    def _persist(self):
+        # Caller holds self._lock
+        try:
+            os.makedirs(settings.model_cache_dir, exist_ok=True)
+            self._faiss.write_index(self._index, self._index_path)
+            with open(self._results_path, "w") as f:
+                json.dump(self._semantic_results, f)
+        except Exception as e:
+            logger.debug(f"Semantic cache persist failed: {str(e)}")
+
+
+# Shared instance (None when caching is disabled)
+try:
+    ai_cache = AIResponseCache() if settings.ai_cache_enabled else None
+except Exception as e:
+    logger.warning(f"AI cache initialization failed: {str(e)}")
+    ai_cache = None
@@ -2,17 +2,74 @@
 import os
 import json
 import re
-import requests
+import time
+import atexit
+import asyncio
+import httpx
+import orjson
+import ijson
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
 from typing import Dict, Any, List, Optional
 from config import settings
-from tenacity import retry, stop_after_attempt, wait_exponential, before_sleep_log
+from ai_cache import ai_cache
 import logging
-from pydantic import BaseModel, ValidationError
+import msgspec
 
 logger = logging.getLogger("AIModel")
 
-# Define structured output model
-class InvoiceDTO(BaseModel):
+# Settings don't change at runtime - normalize the model type once
+_MODEL_TYPE = settings.ai_model_type.lower()
+
+# Request headers are static per process; build once and share a
+# read-only view so no caller can mutate them
+_HEADERS = MappingProxyType({
+    "Authorization": f"Bearer {settings.ai_api_key}",
+    "Content-Type": "application/json",
+    "Accept": "application/json"
+}) if settings.ai_api_key else None
+
+# Persistent HTTP/2 client shared across calls - avoids a fresh TCP+TLS
+# handshake per request and multiplexes concurrent calls over one connection
+_HTTP = httpx.Client(
+    transport=httpx.HTTPTransport(
+        http2=True,
+        retries=0,  # _call_ai_api owns the retry policy; don't stack transport retries
+        limits=httpx.Limits(
+            max_keepalive_connections=40,
+            max_connections=100,
+            keepalive_expiry=30.0
+        )
+    ),
+    timeout=httpx.Timeout(settings.ai_timeout, connect=10.0)
+)
+atexit.register(_HTTP.close)
+
+# Bodies smaller than this parse faster buffered than incrementally
+_IJSON_MIN_BYTES = 4096
+
+class _RawStream:
+    """Minimal file-like adapter exposing httpx's raw byte stream to ijson"""
+    def __init__(self, response):
+        self._chunks = response.iter_raw()
+        self._buffer = b""
+
+    def read(self, size: int = -1) -> bytes:
+        if size < 0:
+            data = self._buffer + b"".join(self._chunks)
+            self._buffer = b""
+            return data
+        while len(self._buffer) < size:
+            try:
+                self._buffer += next(self._chunks)
+            except StopIteration:
+                break
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+# Define structured output model (msgspec C-level decode/validate - one
+# pass instead of JSON-parse + reflective Pydantic validation)
+class InvoiceDTO(msgspec.Struct, kw_only=True):
     InvoiceNumber: Optional[str] = None
     InvoiceDate: Optional[str] = None
     DueDate: Optional[str] = None
@@ -27,63 +84,215 @@ class InvoiceDTO(BaseModel):
     ProductCategory: Optional[str] = None
     AIAccuracyScore: Optional[float] = None
 
-class AIResponse(BaseModel):
+class AIResponse(msgspec.Struct, kw_only=True):
     dto: InvoiceDTO
     raw_response: Optional[Dict[str, Any]] = None
     warnings: Optional[List[str]] = None
 
-@retry(
-    stop=stop_after_attempt(3),
-    wait=wait_exponential(multiplier=1, min=4, max=10),
-    before_sleep=before_sleep_log(logger, logging.WARNING),
-    reraise=True
-)
+# Known DTO keys, computed once - LLMs routinely invent extra fields and
+# filtering them with one dict comprehension is cheaper than having the
+# converter consider them at all
+_DTO_FIELDS = frozenset(InvoiceDTO.__struct_fields__)
+
+def _too_short_for_extraction(ocr_text: str) -> bool:
+    """Blank pages and scanner failures aren't worth an API round-trip"""
+    return (
+        not ocr_text
+        or len(ocr_text.strip()) < 20
+        or not any(c.isdigit() for c in ocr_text)
+    )
+
 def process_with_ai(ocr_text: str) -> Dict[str, Any]:
     if not settings.ai_api_key:
         logger.warning("AI processing disabled - no API key configured")
         return {"error": "AI processing disabled - no API key configured"}
-    
+
+    if _too_short_for_extraction(ocr_text):
+        logger.info("Skipping AI call - OCR text too short for extraction")
+        return msgspec.to_builtins(AIResponse(
+            dto=InvoiceDTO(),
+            warnings=["ocr_text too short for extraction"]
+        ))
+
+    if ai_cache is not None:
+        cached = ai_cache.get(ocr_text)
+        if cached is not None:
+            return cached
+
     prompt = _build_prompt(ocr_text)
-    headers = _prepare_headers()
-    payload = _prepare_payload(prompt)
+    payload = _prepare_payload(ocr_text)
+
+    logger.debug("AI PROMPT (%d chars)", len(prompt))
+    if settings.ai_debug_dump_prompts and logger.isEnabledFor(logging.DEBUG):
+        logger.debug("----- AI PROMPT -----\n%s", prompt)
+        logger.debug("----- AI PAYLOAD -----\n%s", orjson.dumps(payload, option=orjson.OPT_INDENT_2).decode())
 
-    logger.info("----- AI PROMPT -----")
-    logger.info(prompt)
 
-    logger.info("----- AI PAYLOAD -----")
-    logger.info(json.dumps(payload, indent=2))
-    
     try:
-        response = _call_ai_api(headers, payload)
+        response = _call_ai_api(_HEADERS, payload)
         content = _process_ai_response(response)
+        result = _finalize_ai_result(content)
+        if ai_cache is not None and "dto" in result:
+            ai_cache.put(ocr_text, result)
+        return result
 
-        json_data = None
-        for extractor in [_extract_json_strict, _extract_json_relaxed, _extract_json_fallback]:
-            try:
-                json_data = extractor(content)
-                if json_data:
-                    break
-            except Exception as e:
-                logger.debug(f"JSON extraction attempt failed: {str(e)}")
-        
-        if not json_data:
-            raise ValueError("All JSON extraction attempts failed")
+    except Exception as e:
+        logger.error(f"AI processing failed: {str(e)}")
+        return {
+            "error": str(e),
+            "original_prompt": prompt[:200] + "..." if prompt else None,
+            "suggestion": "Check the API response format"
+        }
+
+def _finalize_ai_result(content: str) -> Dict[str, Any]:
+    """Extract and validate the invoice JSON from raw model output"""
+    json_data = _extract_json(content)
+    if not json_data:
+        raise ValueError("All JSON extraction attempts failed")
+
+    clean = {k: v for k, v in json_data.items() if k in _DTO_FIELDS}
+    try:
+        validated = AIResponse(
+            #dto=msgspec.convert(json_data.get("dto", {}), InvoiceDTO, strict=False),
+            dto=msgspec.convert(clean, InvoiceDTO, strict=False),
+            #raw_response=json_data
+        )
+        return msgspec.to_builtins(validated)
+    except msgspec.ValidationError as ve:
+        logger.warning(f"Response validation failed: {str(ve)}")
+        return {
+            "partial_result": json_data,
+            "validation_errors": str(ve),
+            "warning": "Response validation failed"
+        }
+
+async def process_with_ai_batch(ocr_texts: List[str]) -> List[Dict[str, Any]]:
+    """
+    Process many OCR texts concurrently against the shared AsyncClient.
+    Network latency dominates this workload, so firing the requests in
+    parallel (bounded by ai_concurrency via the shared semaphore)
+    collapses N serial round-trips into roughly one. Each item goes
+    through process_with_ai_async, so batch work gets the same cache
+    lookups and retry policy on transient statuses as the
+    single-document paths. Callers doing bulk extraction should use
+    this instead of looping process_with_ai.
+    """
+    if not settings.ai_api_key:
+        logger.warning("AI processing disabled - no API key configured")
+        return [{"error": "AI processing disabled - no API key configured"}] * len(ocr_texts)
+
+    return list(await asyncio.gather(
+        *[process_with_ai_async(text) for text in ocr_texts]
+    ))
+
+# Shared client for single-shot async callers (the request handlers).
+# Created lazily so it binds to the running event loop; the semaphore
+# bounds global in-flight calls the same way process_with_ai_batch does.
+_ASYNC_HTTP: Optional[httpx.AsyncClient] = None
+_ASYNC_SEM: Optional["asyncio.Semaphore"] = None
+
+def _async_client() -> httpx.AsyncClient:
+    global _ASYNC_HTTP, _ASYNC_SEM
+    if _ASYNC_HTTP is None:
+        _ASYNC_HTTP = httpx.AsyncClient(
+            http2=True,
+            timeout=httpx.Timeout(settings.ai_timeout, connect=10.0),
+            limits=httpx.Limits(
+                max_keepalive_connections=40,
+                max_connections=100,
+                keepalive_expiry=30.0
+            )
+        )
+        _ASYNC_SEM = asyncio.Semaphore(settings.ai_concurrency)
+    return _ASYNC_HTTP
+
+async def aclose_async_client() -> None:
+    """Shutdown hook - close the shared AsyncClient if one was created"""
+    global _ASYNC_HTTP
+    if _ASYNC_HTTP is not None:
+        await _ASYNC_HTTP.aclose()
+        _ASYNC_HTTP = None
+
+async def _call_ai_api_with_retry(client: httpx.AsyncClient, headers: Dict[str, str], payload: Dict[str, Any]):
+    """Async twin of _call_ai_api: same retry policy, asyncio.sleep backoff"""
+    content = orjson.dumps(payload)
+    last_exc = None
+
+    for attempt in range(_MAX_API_ATTEMPTS):
+        if attempt:
+            delay = min(10, 4 * 2 ** (attempt - 1))
+            logger.warning(f"Retrying AI API call in {delay}s (attempt {attempt + 1}/{_MAX_API_ATTEMPTS})")
+            await asyncio.sleep(delay)
 
         try:
-            validated = AIResponse(
-                #dto=InvoiceDTO(**json_data.get("dto", {})),
-                dto=InvoiceDTO(**json_data),
-                #raw_response=json_data
+            response = await client.post(
+                settings.ai_api_base_url,
+                headers=headers,
+                content=content
             )
-            return validated.dict()
-        except ValidationError as ve:
-            logger.warning(f"Response validation failed: {str(ve)}")
-            return {
-                "partial_result": json_data,
-                "validation_errors": str(ve),
-                "warning": "Response validation failed"
-            }
+        except (httpx.ConnectError, httpx.TimeoutException) as e:
+            last_exc = e
+            logger.warning(f"AI API connection failed: {str(e)}")
+            continue
+
+        if response.status_code in _RETRYABLE_STATUS:
+            last_exc = httpx.HTTPStatusError(
+                f"Server error '{response.status_code}'",
+                request=response.request,
+                response=response
+            )
+            logger.warning(f"AI API returned retryable status {response.status_code}")
+            continue
+
+        try:
+            response.raise_for_status()
+            return response
+        except httpx.HTTPStatusError as e:
+            logger.error(f"AI API request failed. Status: {e.response.status_code}")
+            logger.error(f"Response text: {e.response.text}")
+            raise
+
+    logger.error(f"AI API request failed after {_MAX_API_ATTEMPTS} attempts: {str(last_exc)}")
+    raise last_exc
+
+async def process_with_ai_async(ocr_text: str) -> Dict[str, Any]:
+    """
+    Async counterpart of process_with_ai for callers already on the event
+    loop. The remote call awaits on the shared AsyncClient instead of
+    occupying a worker thread for its whole round-trip, so under load the
+    loop keeps serving other requests while the LLM thinks.
+    """
+    if not settings.ai_api_key:
+        logger.warning("AI processing disabled - no API key configured")
+        return {"error": "AI processing disabled - no API key configured"}
+
+    if _too_short_for_extraction(ocr_text):
+        logger.info("Skipping AI call - OCR text too short for extraction")
+        return msgspec.to_builtins(AIResponse(
+            dto=InvoiceDTO(),
+            warnings=["ocr_text too short for extraction"]
+        ))
 
+    if ai_cache is not None:
+        cached = ai_cache.get(ocr_text)
+        if cached is not None:
+            return cached
+
+    client = _async_client()
+    prompt = _build_prompt(ocr_text)
+    payload = _prepare_payload(ocr_text)
+
+    try:
+        async with _ASYNC_SEM:
+            response = await _call_ai_api_with_retry(client, _HEADERS, payload)
+        response_json = orjson.loads(response.content)
+        if "choices" not in response_json:
+            raise ValueError("Invalid response format: missing 'choices'")
+        content = response_json["choices"][0]["message"]["content"]
+        result = _finalize_ai_result(content)
+        if ai_cache is not None and "dto" in result:
+            ai_cache.put(ocr_text, result)
+        return result
     except Exception as e:
         logger.error(f"AI processing failed: {str(e)}")
         return {
@@ -92,41 +301,52 @@ def process_with_ai(ocr_text: str) -> Dict[str, Any]:
             "suggestion": "Check the API response format"
         }
 
-def _build_prompt(ocr_text: str) -> str:
-    example = InvoiceDTO(
-        InvoiceNumber="INV-123456",
-        InvoiceDate="2024-06-19",
-        DueDate="2024-07-19",
-        InvoiceAmount=100.0,
-        TaxAmount=15.0,
-        NetAmount=85.0,
-        PaymentStatus="PAID",
-        VendorName="Vendor ABC Ltd.",
-        ProductCategory="Office Supplies",
-        AIAccuracyScore=97.5
-    )
+def process_batch(ocr_texts: List[str]) -> List[Dict[str, Any]]:
+    """
+    Thread-pool batch variant for synchronous callers. The hot path is
+    network-bound (the GIL is released during socket I/O), so mapping
+    process_with_ai across worker threads scales roughly linearly up to
+    the provider rate limit. Bulk callers should use this or
+    process_with_ai_batch instead of looping process_with_ai.
+    """
+    with ThreadPoolExecutor(max_workers=settings.ai_concurrency or 8) as executor:
+        return list(executor.map(process_with_ai, ocr_texts))
+
+# Prompt templates are static per model type - only ocr_text varies.
+# Build them once at import so _build_prompt is a single %-substitution
+# instead of per-call DTO construction + JSON serialization.
+_EXAMPLE_JSON = msgspec.json.format(msgspec.json.encode(InvoiceDTO(
+    InvoiceNumber="INV-123456",
+    InvoiceDate="2024-06-19",
+    DueDate="2024-07-19",
+    InvoiceAmount=100.0,
+    TaxAmount=15.0,
+    NetAmount=85.0,
+    PaymentStatus="PAID",
+    VendorName="Vendor ABC Ltd.",
+    ProductCategory="Office Supplies",
+    AIAccuracyScore=97.5
+)), indent=2).decode()
 
-    if settings.ai_model_type.lower() == "llama":
-        return f"""Extract invoice data from OCR text into this JSON format:
-{example.json(indent=2)}
+_PROMPT_TEMPLATES = {
+    "llama": f"""Extract invoice data from OCR text into this JSON format:
+{_EXAMPLE_JSON}
 
 OCR Text:
-{ocr_text}
+%s
 
 Respond ONLY with valid JSON matching this format.
-"""
-    elif settings.ai_model_type.lower() == "anthropic":
-        return f"""Extract invoice data into this exact JSON format:
-{example.json(indent=2)}
+""",
+    "anthropic": f"""Extract invoice data into this exact JSON format:
+{_EXAMPLE_JSON}
 
 From this OCR text:
-{ocr_text}
+%s
 
 Respond ONLY with valid JSON.
-"""
-    else:
-        return f"""Extract invoice data from OCR text into this JSON format:
-{example.json(indent=2)}
+""",
+    "gpt": f"""Extract invoice data from OCR text into this JSON format:
+{_EXAMPLE_JSON}
 
 Rules:
 - Use exact values from OCR when possible
@@ -136,17 +356,45 @@ Rules:
 - STRICT valid JSON only
 
 OCR Text:
-{ocr_text}
+%s
 """
+}
 
-def _prepare_headers() -> Dict[str, str]:
-    return {
-        "Authorization": f"Bearer {settings.ai_api_key}",
-        "Content-Type": "application/json",
-        "Accept": "application/json"
-    }
+# Static instruction block per model type: everything except the OCR text.
+# Keeping this in the system message ahead of the dynamic user content lets
+# provider-side prompt caching (OpenAI automatic prefix cache, Anthropic
+# cache_control) reuse the example + rules tokens across requests.
+_STATIC_INSTRUCTIONS = {
+    "llama": f"""You are a strict data extractor. Respond with valid JSON only.
+
+Extract invoice data from OCR text into this JSON format:
+{_EXAMPLE_JSON}
+
+Respond ONLY with valid JSON matching this format.""",
+    "anthropic": f"""You are a strict data extractor. Respond with valid JSON only.
+
+Extract invoice data into this exact JSON format:
+{_EXAMPLE_JSON}
 
-def _prepare_payload(prompt: str) -> Dict[str, Any]:
+Respond ONLY with valid JSON.""",
+    "gpt": f"""You are a strict data extractor. Respond with valid JSON only.
+
+Extract invoice data from OCR text into this JSON format:
+{_EXAMPLE_JSON}
+
+Rules:
+- Use exact values from OCR when possible
+- Missing fields = null
+- Combine descriptions
+- Estimate AIAccuracyScore 0-100
+- STRICT valid JSON only"""
+}
+
+def _build_prompt(ocr_text: str) -> str:
+    template = _PROMPT_TEMPLATES.get(_MODEL_TYPE, _PROMPT_TEMPLATES["gpt"])
+    return template % ocr_text
+
+def _prepare_payload(ocr_text: str) -> Dict[str, Any]:
     if not settings.ai_model_name:
         raise ValueError("AI model name not configured")
 
@@ -160,110 +408,193 @@ def _prepare_payload(prompt: str) -> Dict[str, Any]:
         logger.warning(f"ai_max_tokens access failed: {str(e)} — using fallback 2000")
         max_tokens = 2000
 
+    static_block = _STATIC_INSTRUCTIONS.get(_MODEL_TYPE, _STATIC_INSTRUCTIONS["gpt"])
+    user_content = f"OCR Text:\n{ocr_text}"
+
+    if settings.ai_enable_prompt_cache and _MODEL_TYPE == "anthropic":
+        # Explicit cache marker on the static prefix: ~90% input-token
+        # discount on the example + rules block after the first request
+        messages = [
+            {"role": "system", "content": [
+                {"type": "text", "text": static_block, "cache_control": {"type": "ephemeral"}}
+            ]},
+            {"role": "user", "content": user_content}
+        ]
+    else:
+        # Static-before-dynamic ordering triggers automatic prefix caching
+        messages = [
+            {"role": "system", "content": static_block},
+            {"role": "user", "content": user_content}
+        ]
+
     payload = {
         "model": settings.ai_model_name,
-        "messages": [
-            {"role": "system", "content": "You are a strict data extractor. Respond with valid JSON only."},
-            {"role": "user", "content": prompt}
-        ],
+        "messages": messages,
         "temperature": max(0, min(float(settings.ai_temperature), 2)),
         "max_tokens": min(4000, max_tokens)
     }
 
-    if settings.ai_model_type.lower() in ["gpt"]:
+    if _MODEL_TYPE in ["gpt"]:
         payload["response_format"] = {"type": "json_object"}
 
     return payload
 
+# Only transient failures are worth retrying; 4xx config errors and
+# malformed-response bugs should fail fast instead of burning LLM calls
+_RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+_MAX_API_ATTEMPTS = 3
+
 def _call_ai_api(headers: Dict[str, str], payload: Dict[str, Any]):
-    try:
-        response = requests.post(
-            settings.ai_api_base_url,
-            headers=headers,
-            json=payload,
-            timeout=settings.ai_timeout,
-            stream=settings.ai_stream
-        )
-        response.raise_for_status()
-        return response
-    except requests.exceptions.RequestException as e:
-        logger.error(f"AI API request failed. Status: {e.response.status_code if hasattr(e, 'response') else 'No response'}")
-        logger.error(f"Response text: {e.response.text if hasattr(e, 'response') else ''}")
-        raise
+    content = orjson.dumps(payload)
+    last_exc = None
+
+    for attempt in range(_MAX_API_ATTEMPTS):
+        if attempt:
+            delay = min(10, 4 * 2 ** (attempt - 1))
+            logger.warning(f"Retrying AI API call in {delay}s (attempt {attempt + 1}/{_MAX_API_ATTEMPTS})")
+            time.sleep(delay)
+
+        try:
+            # Always open in stream mode so the body can be parsed while it
+            # downloads; buffered callers just read() it in one go.
+            request = _HTTP.build_request(
+                "POST",
+                settings.ai_api_base_url,
+                headers=headers,
+                content=content
+            )
+            response = _HTTP.send(request, stream=True)
+        except (httpx.ConnectError, httpx.TimeoutException) as e:
+            last_exc = e
+            logger.warning(f"AI API connection failed: {str(e)}")
+            continue
+
+        if response.status_code in _RETRYABLE_STATUS:
+            response.read()
+            response.close()
+            last_exc = httpx.HTTPStatusError(
+                f"Server error '{response.status_code}'",
+                request=request,
+                response=response
+            )
+            logger.warning(f"AI API returned retryable status {response.status_code}")
+            continue
+
+        try:
+            response.raise_for_status()
+            return response
+        except httpx.HTTPStatusError as e:
+            e.response.read()  # streamed error bodies must be read before .text
+            logger.error(f"AI API request failed. Status: {e.response.status_code}")
+            logger.error(f"Response text: {e.response.text}")
+            raise
+
+    logger.error(f"AI API request failed after {_MAX_API_ATTEMPTS} attempts: {str(last_exc)}")
+    raise last_exc
+
+def _extract_delta(data: Dict[str, Any]) -> Optional[str]:
+    """Pull the content delta out of one SSE chunk, walking the key path once"""
+    choices = data.get("choices")
+    if choices:
+        return choices[0]["delta"].get("content")
+    return None
 
 def _process_ai_response(response) -> str:
     try:
         if settings.ai_stream:
-            full_content = ""
-            for line in response.iter_lines():
-                if line:
+            parts = []
+            try:
+                for line in response.iter_lines():
+                    # Empty keep-alives and the [DONE] sentinel are the
+                    # common case - skip them before any JSON parse
+                    if not line or line == "data: [DONE]":
+                        continue
+                    if line.startswith("data: "):
+                        line = line[6:]
                     try:
-                        data = json.loads(line.decode("utf-8"))
-                        if "choices" in data and data["choices"][0]["delta"].get("content"):
-                            full_content += data["choices"][0]["delta"]["content"]
+                        delta = _extract_delta(orjson.loads(line))
+                        if delta:
+                            parts.append(delta)
                     except json.JSONDecodeError:
                         continue
-            return full_content
+            finally:
+                response.close()
+            return "".join(parts)
         else:
-            response_json = response.json()
+            content_length = int(response.headers.get("content-length") or 0)
+            if content_length >= _IJSON_MIN_BYTES:
+                # Incremental decode: start pulling the content field out
+                # while the body is still downloading
+                try:
+                    for value in ijson.items(_RawStream(response), "choices.item.message.content"):
+                        return value
+                    raise ValueError("Invalid response format: missing 'choices'")
+                finally:
+                    response.close()
+            response.read()
+            response_json = orjson.loads(response.content)
             if "choices" not in response_json:
                 raise ValueError("Invalid response format: missing 'choices'")
             return response_json["choices"][0]["message"]["content"]
     except Exception as e:
         logger.error(f"Failed to process AI response: {str(e)}")
-        logger.error(f"Raw response: {response.text[:500]}")
+        try:
+            response.read()
+            logger.error(f"Raw response: {response.text[:500]}")
+        except Exception:
+            pass
         raise
 
-def _extract_json_strict(content: str) -> Dict:
-    try:
-        return json.loads(content.strip())
-    except json.JSONDecodeError:
-        json_match = re.search(r'\{.*\}', content, re.DOTALL)
-        if json_match:
-            return json.loads(json_match.group(0))
-        raise ValueError("No valid JSON found in strict mode")
+def _extract_json(content: str) -> Dict:
+    """
+    Deterministic single-pass JSON extraction: strip code fences, try the
+    whole payload, then the outermost brace slice, then line-by-line.
+    Each stage is attempted at most once, so a malformed response costs
+    one traceback instead of three overlapping extractor failures.
+    """
+    s = content.strip()
+    if s.startswith('```'):
+        s = s.removeprefix('```json').removeprefix('```')
+        s = s.removesuffix('```').strip()
 
-def _extract_json_relaxed(content: str) -> Dict:
     try:
-        clean_content = content.strip()
-        if clean_content.startswith('```json'):
-            clean_content = clean_content[7:-3].strip()
-        elif clean_content.startswith('```'):
-            clean_content = clean_content[3:-3].strip()
-        return json.loads(clean_content)
+        return orjson.loads(s)
     except json.JSONDecodeError:
-        lines = [line for line in content.split('\n') if line.strip()]
-        for line in lines:
+        pass
+
+    start = s.find('{')
+    end = s.rfind('}')
+    if start >= 0 and end > start:
+        try:
+            return orjson.loads(s[start:end+1])
+        except json.JSONDecodeError:
+            pass
+
+    for line in s.split('\n'):
+        line = line.strip()
+        if line.startswith('{'):
             try:
-                return json.loads(line)
+                return orjson.loads(line)
             except json.JSONDecodeError:
                 continue
-        raise ValueError("No valid JSON found in relaxed mode")
 
-def _extract_json_fallback(content: str) -> Dict:
-    try:
-        start = content.find('{')
-        end = content.rfind('}')
-        if start >= 0 and end > start:
-            return json.loads(content[start:end+1])
-        raise ValueError("No JSON structure found")
-    except json.JSONDecodeError as e:
-        raise ValueError(f"Fallback extraction failed: {str(e)}")
+    raise ValueError("No valid JSON found in AI response")
 
 def _validate_response(content: str) -> AIResponse:
     content = content.strip()
-    json_match = re.search(r'\{.*\}', content, re.DOTALL)
-    if not json_match:
+    start = content.find('{')
+    end = content.rfind('}')
+    if start < 0 or end <= start:
         raise ValueError("No JSON found in AI response")
-    
+
     try:
-        raw_data = json.loads(json_match.group(0))
+        raw_data = orjson.loads(content[start:end+1])
     except json.JSONDecodeError as e:
         raise ValueError(f"Invalid JSON from AI: {str(e)}")
     
     try:
         return AIResponse(
-            dto=InvoiceDTO(**raw_data.get("dto", {})),
+            dto=msgspec.convert(raw_data.get("dto", {}), InvoiceDTO, strict=False),
             raw_response=raw_data
         )
     except Exception as e:
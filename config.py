@@ -1,70 +1,92 @@
 # config.py (Enhanced Configuration Management)
-from pydantic import BaseSettings, Field, validator
+from pydantic import Field, field_validator
+from pydantic_settings import BaseSettings, SettingsConfigDict
 from pathlib import Path
 from typing import Optional, Dict, Any, List
 import logging
 
 class Settings(BaseSettings):
     # OCR Configuration
-    ocr_api_key: str = Field(..., env="OCR_API_KEY")
-    default_ocr_engine: str = Field("auto", env="DEFAULT_OCR_ENGINE")
-    pdf_dpi: int = Field(300, env="PDF_DPI")
-    max_file_size: int = Field(10 * 1024 * 1024, env="MAX_FILE_SIZE")  # 10MB
+    ocr_api_key: str = Field(...)
+    default_ocr_engine: str = Field("auto")
+    pdf_dpi: int = Field(300)
+    max_file_size: int = Field(10 * 1024 * 1024)  # 10MB
     ocr_engines: Dict[str, bool] = Field({
         "doctr": True,
         "easyocr": True,
         "tesseract": True
-    }, env="OCR_ENGINES")
+    })
     
     # AI Configuration
-    ai_api_key: Optional[str] = Field(None, env="AI_API_KEY")
-    ai_api_base_url: str = Field("https://api.openai.com/v1/chat/completions", env="AI_API_BASE_URL")
-    ai_model_name: str = Field("gpt-4", env="AI_MODEL_NAME")
-    ai_model_type: str = Field("gpt", env="AI_MODEL_TYPE")  # gpt, llama, anthropic
-    ai_temperature: float = Field(0.1, env="AI_TEMPERATURE")
-    ai_stream: bool = Field(False, env="AI_STREAM")
-    ai_timeout: int = Field(120, env="AI_TIMEOUT")
-    ai_max_tokens: int = Field(2000, env="AI_MAX_TOKENS")  # Add this line
-    ai_response_format: Optional[Dict[str, str]] = Field(None, env="AI_RESPONSE_FORMAT")
+    ai_api_key: Optional[str] = Field(None)
+    ai_api_base_url: str = Field("https://api.openai.com/v1/chat/completions")
+    ai_model_name: str = Field("gpt-4")
+    ai_model_type: str = Field("gpt")  # gpt, llama, anthropic
+    ai_temperature: float = Field(0.1)
+    ai_stream: bool = Field(False)
+    ai_timeout: int = Field(120)
+    ai_max_tokens: int = Field(2000)  # Add this line
+    ai_concurrency: int = Field(8)  # Max in-flight batch AI calls
+    ai_cache_enabled: bool = Field(True)
+    ai_cache_size: int = Field(256)  # Exact-match LRU entries
+    ai_cache_similarity: float = Field(0.87)  # Semantic hit threshold
+    ai_enable_prompt_cache: bool = Field(True)
+    ai_debug_dump_prompts: bool = Field(False)  # Dump full prompt/payload at DEBUG
+    ai_response_format: Optional[Dict[str, str]] = Field(None)
+    worker_threads: int = Field(8)  # Thread pool for CPU-bound request work
+    expose_timings: bool = Field(True)  # X-Process-Time header middleware
+    ocr_workers: int = Field(2)  # OCR process-pool size; 0 runs OCR inline
+    ocr_cache_size: int = Field(2048)  # OCR result cache entries; 0 disables
+    ocr_cache_ttl: int = Field(3600)  # OCR cache entry lifetime, seconds
+    doctr_compile: bool = Field(False)  # torch.compile doctr sub-models (compile pause on first pass)
+    doctr_int8: bool = Field(False)  # dynamic int8 quantization of the doctr recognizer
     
 
   
     
     # Path Configuration
-    model_cache_dir: str = Field(str(Path.home() / ".cache" / "ocr_models"), env="MODEL_CACHE_DIR")
-    static_files_dir: str = Field(str(Path(__file__).parent / "static"), env="STATIC_FILES_DIR")
-    log_level: str = Field("INFO", env="LOG_LEVEL")
+    model_cache_dir: str = Field(str(Path.home() / ".cache" / "ocr_models"))
+    static_files_dir: str = Field(str(Path(__file__).parent / "static"))
+    log_level: str = Field("INFO")
     
     # Validation
-    @validator("default_ocr_engine")
+    @field_validator("default_ocr_engine")
+    @classmethod
     def validate_engine(cls, v):
         if v not in ["auto", "doctr", "easyocr", "tesseract"]:
             raise ValueError("Invalid OCR engine specified")
         return v
     
-    @validator("pdf_dpi")
+    @field_validator("pdf_dpi")
+    @classmethod
     def validate_dpi(cls, v):
         if not 72 <= v <= 600:
             raise ValueError("DPI must be between 72 and 600")
         return v
     
     # Add these validators to your Settings class
-    @validator("ai_max_tokens")
+    @field_validator("ai_max_tokens")
+    @classmethod
     def validate_max_tokens(cls, v):
         if not 100 <= v <= 4000:
             raise ValueError("Max tokens must be between 100 and 4000")
         return v
 
-    @validator("ai_temperature")
+    @field_validator("ai_temperature")
+    @classmethod
     def validate_temperature(cls, v):
         if not 0.0 <= v <= 2.0:
             raise ValueError("Temperature must be between 0.0 and 2.0")
         return v
     
-    class Config:
-        env_file = ".env"
-        env_file_encoding = 'utf-8'
-        case_sensitive = False
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        env_file_encoding="utf-8",
+        case_sensitive=False,
+        # v1 BaseSettings ignored unknown .env keys; v2 forbids them by
+        # default and would refuse to start on entries like OPENAI_API_KEY
+        extra="ignore"
+    )
 
 
 # Initialize settings
@@ -1,378 +1,151 @@
-# import re
-# from typing import Dict, Optional, List, Any
-# from datetime import datetime
-
-# class InvoiceParser:
-#     """Enhanced invoice parser with robust error handling"""
-    
-#     @staticmethod
-#     def parse_invoice(text: str) -> Dict[str, Any]:
-#         """
-#         Robust invoice parsing with:
-#         - Defensive programming
-#         - Better line handling
-#         - Comprehensive error recovery
-#         """
-#         try:
-#             # Normalize text and handle empty cases
-#             if not text or not isinstance(text, str):
-#                 return {"error": "No text provided for parsing"}
-                
-#             # Clean and prepare text
-#             clean_text = re.sub(r'\s+', ' ', text.strip())
-#             lines = [line.strip() for line in clean_text.split('\n') if line.strip()]
-            
-#             if not lines:
-#                 return {"error": "No content found after text cleaning"}
-            
-#             # Extract all fields with error handling
-#             result = {
-#                 "invoice_number": InvoiceParser._safe_extract(lines, r"Invoice Number[:]?\s*([A-Z0-9-]+)"),
-#                 "issue_date": InvoiceParser._safe_extract_date(lines, r"Issue Date[:]?\s*([A-Za-z]+\s\d{1,2},\s\d{4})"),
-#                 "due_date": InvoiceParser._safe_extract_date(lines, r"Due Date[:]?\s*([A-Za-z]+\s\d{1,2},\s\d{4})"),
-#                 "status": InvoiceParser._safe_extract(lines, r"Status[:]?\s*([A-Z]+)"),
-#                 "vendor": InvoiceParser._extract_vendor_info(lines),
-#                 "customer": InvoiceParser._extract_customer_info(lines),
-#                 "items": InvoiceParser._safe_extract_items(lines),
-#                 "amount_due": InvoiceParser._safe_extract_currency(lines, r"Amount Due[:]?\s*(\$\d+\.\d{2})"),
-#                 "subtotal": InvoiceParser._safe_extract_currency(lines, r"Subtotal[:]?\s*(\$\d+\.\d{2})"),
-#                 "tax": InvoiceParser._safe_extract_currency(lines, r"Tax[:]?\s*(\$\d+\.\d{2})")
-#             }
-            
-#             # Calculate completeness score
-#             filled_fields = sum(1 for v in result.values() if v and not isinstance(v, dict) or 
-#                              (isinstance(v, dict) and any(v.values())))
-#             result["_completeness"] = f"{(filled_fields/len(result))*100:.1f}%"
-            
-#             return result
-            
-#         except Exception as e:
-#             return {"error": f"Parsing failed: {str(e)}", "original_text": text[:500] + "..."}
-
-#     @staticmethod
-#     def _safe_extract(lines: List[str], pattern: str) -> Optional[str]:
-#         """Safe field extraction with error handling"""
-#         try:
-#             for line in lines:
-#                 match = re.search(pattern, line, re.IGNORECASE)
-#                 if match:
-#                     return match.group(1).strip()
-#             return None
-#         except:
-#             return None
-
-#     @staticmethod
-#     def _safe_extract_date(lines: List[str], pattern: str) -> Optional[str]:
-#         """Safe date extraction with formatting"""
-#         date_str = InvoiceParser._safe_extract(lines, pattern)
-#         if not date_str:
-#             return None
-            
-#         try:
-#             return datetime.strptime(date_str, "%B %d, %Y").strftime("%Y-%m-%d")
-#         except ValueError:
-#             return date_str
-
-#     @staticmethod
-#     def _safe_extract_currency(lines: List[str], pattern: str) -> Optional[float]:
-#         """Safe currency extraction"""
-#         amount = InvoiceParser._safe_extract(lines, pattern)
-#         try:
-#             return float(amount.replace('$', '')) if amount else None
-#         except:
-#             return None
-
-#     @staticmethod
-#     def _extract_vendor_info(lines: List[str]) -> Dict[str, Optional[str]]:
-#         """Robust vendor info extraction"""
-#         vendor = {"name": None, "address": None, "email": None, "phone": None}
-        
-#         try:
-#             # Find vendor name (look for LLC/Inc patterns)
-#             for line in lines:
-#                 if re.search(r"(LLC|Inc|Ltd|Limited|Corp|\,)", line, re.IGNORECASE):
-#                     vendor["name"] = line.strip()
-#                     break
-                
-#             # Find address (look for street patterns)
-#             for i, line in enumerate(lines):
-#                 if re.search(r"\d{3,5}\s+\w+\s+(St|Street|Ave|Avenue|Rd|Road)", line, re.IGNORECASE):
-#                     vendor["address"] = line.strip()
-#                     if i+1 < len(lines) and re.search(r"[A-Z]{2}\s+\d{5}", lines[i+1]):
-#                         vendor["address"] += ", " + lines[i+1].strip()
-#                     break
-                    
-#             # Find email and phone
-#             for line in lines:
-#                 if not vendor["email"]:
-#                     email_match = re.search(r"[\w\.-]+@[\w\.-]+\.\w+", line)
-#                     if email_match:
-#                         vendor["email"] = email_match.group()
-                
-#                 if not vendor["phone"]:
-#                     phone_match = re.search(r"(\(\d{3}\)\s?\d{3}-\d{4}|\d{3}-\d{3}-\d{4})", line)
-#                     if phone_match:
-#                         vendor["phone"] = phone_match.group()
-                        
-#         except Exception as e:
-#             pass
-            
-#         return vendor
-
-#     @staticmethod
-#     def _extract_customer_info(lines: List[str]) -> Dict[str, Optional[str]]:
-#         """Robust customer info extraction"""
-#         customer = {"name": None, "email": None}
-        
-#         try:
-#             # Find "Bill To" section
-#             for i, line in enumerate(lines):
-#                 if "Bill To" in line and i+1 < len(lines):
-#                     customer["name"] = lines[i+1].strip()
-#                     break
-                    
-#             # Find customer email
-#             for line in lines:
-#                 email_match = re.search(r"[\w\.-]+@[\w\.-]+\.\w+", line)
-#                 if email_match and "support@" not in line.lower():
-#                     customer["email"] = email_match.group()
-#                     break
-                    
-#         except Exception as e:
-#             pass
-            
-#         return customer
-
-#     @staticmethod
-#     def _safe_extract_items(lines: List[str]) -> List[Dict[str, Any]]:
-#         """Safe item extraction with multiple fallbacks"""
-#         items = []
-        
-#         try:
-#             # Try to find items section
-#             item_start = None
-#             for i, line in enumerate(lines):
-#                 if "Item" in line and i+3 < len(lines):
-#                     if any(x in lines[i+1] for x in ["Unit Cost", "Price"]):
-#                         item_start = i+2
-#                         break
-            
-#             # If found standard item section
-#             if item_start:
-#                 for i in range(item_start, len(lines), 4):
-#                     if i+3 >= len(lines):
-#                         break
-                        
-#                     items.append({
-#                         "description": lines[i].strip(),
-#                         "unit_price": InvoiceParser._safe_extract_currency([lines[i+1]], r"(\$\d+\.\d{2})"),
-#                         "quantity": float(re.search(r"\d+", lines[i+2]).group()) if re.search(r"\d+", lines[i+2]) else 1,
-#                         "amount": InvoiceParser._safe_extract_currency([lines[i+3]], r"(\$\d+\.\d{2})")
-#                     })
-#             else:
-#                 # Fallback: look for any price patterns
-#                 for i, line in enumerate(lines):
-#                     price_match = re.search(r"\$\d+\.\d{2}", line)
-#                     if price_match:
-#                         items.append({
-#                             "description": line[:line.find("$")].strip(),
-#                             "unit_price": float(price_match.group().replace("$", "")),
-#                             "quantity": 1,
-#                             "amount": float(price_match.group().replace("$", ""))
-#                         })
-                        
-#         except Exception as e:
-#             pass
-            
-#         return items
-
-# import re
-# from typing import Dict, Optional, List, Any
-# from datetime import datetime
-# from dateutil.parser import parse as parse_date
-
-
-# class InvoiceParser:
-#     """Improved Invoice Parser for OCR text"""
-
-#     @staticmethod
-#     def parse_invoice(text: str) -> Dict[str, Any]:
-#         if not text or not isinstance(text, str):
-#             return {"error": "No text provided"}
-
-#         lines = [line.strip() for line in text.split('\n') if line.strip()]
-#         if not lines:
-#             return {"error": "No lines to parse"}
-
-#         result = {
-#             "invoice_number": InvoiceParser._safe_extract_next_line(lines, ["Invoice Number", "Invoice No", "Inv No", "#"]),
-#             "issue_date": InvoiceParser._safe_extract_date_next_line(lines, ["Issue Date", "Date of Issue", "Invoice Date"]),
-#             "due_date": InvoiceParser._safe_extract_date_next_line(lines, ["Due Date", "Payment Due"]),
-#             "status": InvoiceParser._safe_extract(lines, r"Status[:]?\s*([A-Z]+)"),
-#             "vendor": InvoiceParser._extract_vendor_info(lines),
-#             "customer": InvoiceParser._extract_customer_info(lines),
-#             "items": InvoiceParser._extract_items(lines),
-#             "amount_due": InvoiceParser._safe_extract_currency(lines, r"(?:Amount Due|Balance Due|Total Due|Total Amount)[:\s\$]*([\d,]+\.\d{2})"),
-#             "subtotal": InvoiceParser._safe_extract_currency(lines, r"Subtotal[:]?\s*\$?([\d,]+\.\d{2})"),
-#             "tax": InvoiceParser._safe_extract_currency(lines, r"(?:Tax|VAT|Sales Tax)[:]?\s*\$?([\d,]+\.\d{2})")
-#         }
-
-#         result.update(InvoiceParser._custom_field_hooks(lines))
-
-#         # Scoring
-#         total_fields = len(result)
-#         filled = sum(1 for v in result.values() if InvoiceParser._is_filled(v))
-#         confidence = round(filled / total_fields, 2)
-#         result["_completeness"] = f"{confidence * 100:.1f}%"
-#         result["_confidence_score"] = confidence
-#         result["_fallback_needed"] = confidence < 0.6
-#         result["_raw_context"] = InvoiceParser._annotate_raw_context(lines[:15])
-
-#         return result
-
-#     # === Extraction Utilities ===
-
-#     @staticmethod
-#     def _safe_extract(lines: List[str], pattern: str) -> Optional[str]:
-#         try:
-#             for line in lines:
-#                 match = re.search(pattern, line, re.IGNORECASE)
-#                 if match:
-#                     return match.group(1).strip()
-#         except:
-#             pass
-#         return None
-
-#     @staticmethod
-#     def _safe_extract_next_line(lines: List[str], keywords: List[str]) -> Optional[str]:
-#         for i, line in enumerate(lines):
-#             if any(k.lower() in line.lower() for k in keywords):
-#                 return lines[i+1].strip() if i+1 < len(lines) else None
-#         return None
-
-#     @staticmethod
-#     def _safe_extract_date_next_line(lines: List[str], keywords: List[str]) -> Optional[str]:
-#         raw = InvoiceParser._safe_extract_next_line(lines, keywords)
-#         if not raw:
-#             return None
-#         try:
-#             return parse_date(raw, fuzzy=True).strftime("%Y-%m-%d")
-#         except:
-#             return raw.strip()
-
-#     @staticmethod
-#     def _safe_extract_currency(lines: List[str], pattern: str) -> Optional[float]:
-#         raw = InvoiceParser._safe_extract(lines, pattern)
-#         if raw:
-#             try:
-#                 return float(re.sub(r"[^\d.]", "", raw))
-#             except:
-#                 return None
-#         return None
-
-#     # === Vendor / Customer ===
-
-#     @staticmethod
-#     def _extract_vendor_info(lines: List[str]) -> Dict[str, Optional[str]]:
-#         vendor = {"name": None, "address": None, "email": None, "phone": None}
-#         for line in lines[:10]:
-#             if re.search(r"(LLC|Inc|Ltd|Limited|Corp|Company|WOCOM)", line, re.IGNORECASE):
-#                 vendor["name"] = line
-#             if re.search(r"\d{1,5}.+(Street|Ave|Road|Lane|Blvd|Drive|Rd)", line, re.IGNORECASE):
-#                 vendor["address"] = line
-#         for line in lines:
-#             if not vendor["email"]:
-#                 email_match = re.search(r"[\w\.-]+@[\w\.-]+\.\w+", line)
-#                 if email_match:
-#                     vendor["email"] = email_match.group()
-#             if not vendor["phone"]:
-#                 phone_match = re.search(r"(\(?\d{3,4}\)?[-.\s]?\d{3}[-.\s]?\d{4}|\d{7,})", line)
-#                 if phone_match:
-#                     vendor["phone"] = phone_match.group()
-#         return vendor
-
-#     @staticmethod
-#     def _extract_customer_info(lines: List[str]) -> Dict[str, Optional[str]]:
-#         customer = {"name": None, "email": None}
-#         for i, line in enumerate(lines):
-#             if "Bill To" in line and i + 1 < len(lines):
-#                 customer["name"] = lines[i + 1].strip()
-#         for line in lines:
-#             email_match = re.search(r"[\w\.-]+@[\w\.-]+\.\w+", line)
-#             if email_match and "support@" not in line.lower():
-#                 customer["email"] = email_match.group()
-#                 break
-#         return customer
-
-#     # === Items ===
-
-#     @staticmethod
-#     def _extract_items(lines: List[str]) -> List[Dict[str, Any]]:
-#         items = []
-#         for i, line in enumerate(lines):
-#             price_match = re.search(r"\$[\d,]+\.\d{2}", line)
-#             if price_match:
-#                 amount = float(re.sub(r"[^\d.]", "", price_match.group()))
-#                 description = ""
-#                 for offset in range(1, 3):
-#                     if i - offset >= 0 and not re.search(r"\$[\d,]+\.\d{2}", lines[i - offset]):
-#                         description = lines[i - offset].strip() + " " + description
-#                 items.append({
-#                     "description": description.strip(),
-#                     "unit_price": amount,
-#                     "quantity": 1,
-#                     "amount": amount
-#                 })
-#         return items
-
-#     # === Additional Hooks ===
-
-#     @staticmethod
-#     def _custom_field_hooks(lines: List[str]) -> Dict[str, Any]:
-#         return {
-#             "po_number": InvoiceParser._safe_extract(lines, r"PO(?: Number|#)?[:]?\s*([A-Z0-9-]+)"),
-#             "currency": InvoiceParser._safe_extract(lines, r"(USD|JMD|EUR|GBP)")
-#         }
-
-#     @staticmethod
-#     def _is_filled(value: Any) -> bool:
-#         if isinstance(value, dict):
-#             return any(v for v in value.values())
-#         if isinstance(value, list):
-#             return len(value) > 0
-#         return value not in (None, "", [], {})
-
-#     # === Debug / Explainability ===
-
-#     @staticmethod
-#     def _annotate_raw_context(lines: List[str]) -> List[Dict[str, str]]:
-#         labeled = []
-#         for line in lines:
-#             l = line.strip()
-#             if re.search(r"(limited|llc|inc|corp)", l, re.IGNORECASE):
-#                 label = "vendor_name"
-#             elif re.search(r"\d{7,}", l):
-#                 label = "vendor_phone"
-#             elif re.search(r"(invoice|date|due|amount)", l, re.IGNORECASE):
-#                 label = "field_label"
-#             elif re.search(r"(spanish town|red hills|road|rd|kingston)", l, re.IGNORECASE):
-#                 label = "address"
-#             elif re.search(r"jermaine|gray", l, re.IGNORECASE):
-#                 label = "contact_person"
-#             elif "celebration" in l.lower():
-#                 label = "customer_name"
-#             elif l.lower().startswith("the "):
-#                 label = "business_tagline"
-#             else:
-#                 label = "unknown"
-#             labeled.append({"label": label, "value": l})
-#         return labeled
-
-
 import re
-from typing import List, Dict, Any, Optional
+import threading
+from collections import OrderedDict
+from copy import deepcopy
+from datetime import datetime
+from hashlib import blake2b
+from typing import List, Dict, Any, Optional, Tuple
 from dateutil.parser import parse as parse_date
 
+try:
+    import ahocorasick  # pyahocorasick - optional fast keyword matcher
+except ImportError:
+    ahocorasick = None
+
+try:
+    import regex as _regex  # optional: possessive quantifiers (no stdlib support on 3.10)
+except ImportError:
+    _regex = None
+
+# Compiled once at import - the classify/extract loops run these per
+# line, and inline literals pay a re-cache probe on every call
+_DIGITS7_RE = re.compile(r"\d{7,}")
+_DIGITS5_ONLY_RE = re.compile(r"^\d{5,}$")
+_ALPHA_NUM_CODE_RE = re.compile(r"^[A-Z]{2,}\d{3,}$")
+_DATE_RE = re.compile(r"\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b")
+_DATE_ANY_RE = re.compile(r"\d{1,2}[/-]\d{1,2}[/-]\d{2,4}")
+_PHONE_FMT_RE = re.compile(r"^(\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4})$")
+_TOKEN_RE = re.compile(r"[A-Z0-9\-]{4,}")
+_CODE5_RE = re.compile(r"[A-Z0-9]{5,}")
+_AMOUNT_RE = re.compile(r"\$\d{1,3}(?:,\d{3})*\.\d{2}")
+_INT_ONLY_RE = re.compile(r"\d+$")
+_NON_NUMERIC_RE = re.compile(r"[^\d.]")
+if _regex is not None:
+    # Possessive quantifiers (\d++, ?+) forbid backtracking into the
+    # numeric runs and the tax group, so a line that lacks the trailing
+    # total fails fast instead of re-threading the description
+    _ITEM_RE = _regex.compile(
+        r"(?P<desc>.+?)\s+"  # Description
+        r"(?P<rate>\$\d++,\d++\.\d{2})\s+"  # Rate
+        r"(?:\+15\%\s++)?+"  # Optional tax indicator
+        r"(?P<qty>\d++)\s+"  # Quantity
+        r"(?P<total>\$\d++,\d++\.\d{2})"  # Total
+    )
+else:
+    _ITEM_RE = re.compile(
+        r"(?P<desc>.+?)\s+"  # Description
+        r"(?P<rate>\$\d+,\d+\.\d{2})\s+"  # Rate
+        r"(?:\+15\%\s+)?"  # Optional tax indicator
+        r"(?P<qty>\d+)\s+"  # Quantity
+        r"(?P<total>\$\d+,\d+\.\d{2})"  # Total
+    )
+# All four vendor cues fused into one alternation, matched against the
+# already-lowercased line (so no re.IGNORECASE and no per-match
+# casefolding). One engine entry per line replaces four; the named
+# groups say which cue fired where
+_VENDOR_SCAN_RE = re.compile(
+    r"(?P<name>limited|llc|inc|corp|company)"
+    r"|(?P<address>\d{1,5}\s+.+(?:street|ave|road|rd|lane|blvd|drive))"
+    r"|(?P<region>kingston|jamaica)"
+    r"|(?:tel|phone):?\s*(?P<phone>[\d\-\(\) ]+)"
+)
+_CURRENCY_TOKEN_RE = re.compile(r"\b(USD|JMD|EUR|GBP)\b")
+_EMAIL_RE = re.compile(r"[\w\.-]+@[\w\.-]+\.\w+")
+
+# All same-line "label: value" scalar fields in one alternation; a
+# single finditer over the whole document replaces a per-field scan of
+# the labeled lines whenever label and value share a line. Separators
+# stay on [ \t:#$] so a match never leaks across a line break
+_SCALAR_RE = re.compile(
+    r"invoice[ \t]*(?:number|no\.?|#)[ \t:#]*"
+    # Lookahead demands a digit so a following header word ("Issue",
+    # "Date") is never taken for an invoice number
+    r"(?P<invoice_number>(?=[A-Za-z-]*\d)[A-Za-z0-9-]{3,})"
+    r"|(?:balance|amount|total)[ \t]+due[ \t:$]*(?P<amount_due>[\d,]+\.\d{2})"
+    r"|subtotal[ \t:$]*(?P<subtotal>[\d,]+\.\d{2})"
+    r"|\b(?:tax|vat|gct)\b[ \t:$]*(?P<tax>[\d,]+\.\d{2})",
+    re.IGNORECASE,
+)
+
+# Month-name lookup for the dominant "Month D, YYYY" layout - a dict
+# probe instead of strptime's format interpreter and locale tables
+_MONTH_LUT = {month: number for number, month in enumerate((
+    "january", "february", "march", "april", "may", "june", "july",
+    "august", "september", "october", "november", "december"), start=1)}
+for _month, _number in list(_MONTH_LUT.items()):
+    _MONTH_LUT[_month[:3]] = _number
+
+# Invoice dates come in a handful of formats; strptime is C code and
+# beats dateutil's adaptive tokenizer by more than an order of magnitude
+_DATE_FORMATS = [
+    "%B %d, %Y",
+    "%b %d, %Y",
+    "%m/%d/%Y",
+    "%m-%d-%Y",
+    "%Y-%m-%d",
+    "%d/%m/%Y",
+]
+
+
+def _parse_amount(s: str) -> Optional[float]:
+    """First money amount (digits/commas then .NN) in s, or None.
+
+    A direct character walk over a line already singled out by its
+    label; str.isdigit per char stays in C and skips the regex engine
+    for what is a trivial token shape."""
+    n = len(s)
+    i = 0
+    while i < n:
+        c = s[i]
+        if c.isdigit() or c == ",":
+            j = i
+            while j < n and (s[j].isdigit() or s[j] == ","):
+                j += 1
+            if j + 2 < n and s[j] == "." and s[j + 1].isdigit() and s[j + 2].isdigit():
+                try:
+                    return float(s[i:j].replace(",", "") + s[j:j + 3])
+                except ValueError:
+                    return None
+            i = j + 1
+        else:
+            i += 1
+    return None
+
+
+def _scalar_float(scalars: Dict[str, str], key: str) -> Optional[float]:
+    value = scalars.get(key)
+    return float(value.replace(",", "")) if value is not None else None
+
+
+def _fast_parse_date(text: str) -> datetime:
+    # Spelled-out dates resolve through the month table with no
+    # exception on the common path
+    parts = text.replace(",", " ").split()
+    if len(parts) == 3 and parts[1].isdigit() and parts[2].isdigit():
+        month = _MONTH_LUT.get(parts[0].lower().rstrip("."))
+        if month:
+            try:
+                return datetime(int(parts[2]), month, int(parts[1]))
+            except ValueError:
+                pass
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            pass
+    # Oddball formats still get the full fuzzy treatment
+    return parse_date(text, fuzzy=True)
+
 
 class InvoiceParser:
     FIELD_LABELS = {
@@ -389,186 +162,252 @@ class InvoiceParser:
         "customer": ["bill to", "ship to"]
     }
 
+    # FIELD_LABELS flattened once into a tuple of (label, keywords)
+    # pairs: tuple iteration has no dict-entry indirection, and the
+    # builders below get a stable, declaration-ordered view
+    _LABEL_ITEMS: Tuple[Tuple[str, Tuple[str, ...]], ...] = tuple(
+        (label, tuple(keywords)) for label, keywords in FIELD_LABELS.items()
+    )
+
+    # Retried uploads and batch duplicates hand parse() identical text;
+    # a small content-keyed LRU hands back the earlier result with no
+    # regex work at all. Entries are deep-copied both ways so cached
+    # structures stay immune to caller mutation. The cache is shared
+    # across instances and threads, so every access takes the lock -
+    # same discipline as the OCR and template caches.
+    _parse_cache: "OrderedDict[bytes, Dict[str, Any]]" = OrderedDict()
+    _parse_cache_lock = threading.Lock()
+    _PARSE_CACHE_SIZE = 256
+
     CURRENCY_PATTERN = r"\b(USD|JMD|EUR|GBP)\b"
 
     def parse(self, ocr_text: str) -> Dict[str, Any]:
-        lines = [l.strip() for l in ocr_text.split("\n") if l.strip()]
-        labeled = self.classify_lines(lines)
+        cache_key = blake2b(
+            ocr_text.encode("utf-8", "ignore"), digest_size=16
+        ).digest()
+        with self._parse_cache_lock:
+            cached = self._parse_cache.get(cache_key)
+            if cached is not None:
+                self._parse_cache.move_to_end(cache_key)
+        if cached is not None:
+            return deepcopy(cached)
+
+        # Plain C-level splitlines/strip is all the normalization needed
+        # here - no regex-engine whitespace collapse (and splitlines also
+        # swallows the \r that OCR output sometimes carries)
+        lines = [l.strip() for l in ocr_text.splitlines() if l.strip()]
+        # Lowercase once and thread the list through the helpers instead
+        # of re-folding per keyword test and per IGNORECASE match
+        lowers = [l.lower() for l in lines]
+        labels, values, positions = self.classify_lines(lines, lowers)
+
+        # Every email in one findall; vendor and customer consumers pick
+        # from this list instead of running their own document scans.
+        # The "@" literal check skips the engine on email-free documents
+        emails = _EMAIL_RE.findall(ocr_text) if "@" in ocr_text else []
+
+        # One pass over the raw text picks up every field whose label and
+        # value share a line; only the fields it misses fall back to the
+        # labeled-line lookahead scans below
+        scalars: Dict[str, str] = {}
+        for match in _SCALAR_RE.finditer(ocr_text):
+            field = match.lastgroup
+            if field not in scalars:
+                scalars[field] = match.group(field)
+
+        amount_due = _scalar_float(scalars, "amount_due")
+        if amount_due is None:
+            amount_due = self.extract_amount_due(values, positions)
+        subtotal = _scalar_float(scalars, "subtotal")
+        if subtotal is None:
+            subtotal = self.extract_currency_near(values, positions, "subtotal")
+        tax = _scalar_float(scalars, "tax")
+        if tax is None:
+            tax = self.extract_currency_near(values, positions, "tax")
 
         structure = {
-            "invoice_number": self.extract_invoice_number(labeled),
-            "po_number": self.extract_value_near(labeled, "po_number"),
-            "issue_date": self.extract_date(labeled, "issue_date"),
-            "due_date": self.extract_date(labeled, "due_date"),
-            "amount_due": self.extract_amount_due(labeled),
-            "subtotal": self.extract_currency_near(labeled, "subtotal"),
-            "tax": self.extract_currency_near(labeled, "tax"),
-            "vendor": self.parse_vendor_info(lines),
+            "invoice_number": scalars.get("invoice_number") or self.extract_invoice_number(values, positions),
+            "po_number": self.extract_value_near(values, positions, "po_number"),
+            "issue_date": self.extract_date(values, positions, "issue_date"),
+            "due_date": self.extract_date(values, positions, "due_date"),
+            "amount_due": amount_due,
+            "subtotal": subtotal,
+            "tax": tax,
+            "vendor": self.parse_vendor_info(lines, lowers, emails),
             "customer": {
-                "name": self.extract_value(labeled, "customer"),
-                "email": None
+                "name": self.extract_value(values, positions, "customer"),
+                "email": next(
+                    (e for e in emails if not e.lower().startswith("support@")),
+                    None,
+                )
             },
-            "items": self.extract_items(lines),
+            "items": self.extract_items(lines, ocr_text),
             "currency": self.find_currency(lines)
         }
 
-        filled = sum(1 for v in structure.values() if self._is_filled(v))
+        # One isinstance per field instead of a recursive helper call;
+        # the nested dicts here (vendor, customer) only hold scalars
+        filled = 0
+        for v in structure.values():
+            if isinstance(v, dict):
+                if any(v.values()):
+                    filled += 1
+            elif v:
+                filled += 1
         total = len(structure)
         score = round(filled / total, 2)
 
         structure["_completeness"] = f"{score * 100:.1f}%"
         structure["_confidence_score"] = score
         structure["_fallback_needed"] = score < 0.6
-        structure["_raw_context"] = labeled
-
+        structure["_raw_context"] = [
+            {"label": lbl, "value": val} for lbl, val in zip(labels, values)
+        ]
+
+        snapshot = deepcopy(structure)
+        with self._parse_cache_lock:
+            self._parse_cache[cache_key] = snapshot
+            while len(self._parse_cache) > self._PARSE_CACHE_SIZE:
+                self._parse_cache.popitem(last=False)
         return structure
 
-    def classify_lines(self, lines: List[str]) -> List[Dict[str, str]]:
-        results = []
-        for line in lines:
-            lower = line.lower()
-            label = "unknown"
-            for key, keywords in self.FIELD_LABELS.items():
-                if any(k in lower for k in keywords):
-                    label = key
-                    break
-            if not label.startswith("vendor") and re.search(r"\d{7,}", line):
-                label = "vendor_phone"
-            results.append({"label": label, "value": line})
-        return results
+    def classify_lines(
+        self, lines: List[str], lowers: Optional[List[str]] = None
+    ) -> Tuple[List[str], List[str], Dict[str, List[int]]]:
+        if lowers is None:
+            lowers = [l.lower() for l in lines]
+        return _classify_kernel(lines, lowers)
 
-    def extract_invoice_number(self, lines: List[Dict[str, str]]) -> Optional[str]:
+    def extract_invoice_number(self, values: List[str], positions: Dict[str, List[int]]) -> Optional[str]:
         # Look for numeric patterns near invoice number labels
-        for idx, line in enumerate(lines):
-            if line["label"] == "invoice_number":
-                # Check next few lines for potential invoice numbers
-                for offset in range(1, 4):
-                    if idx + offset < len(lines):
-                        candidate = lines[idx + offset]["value"].strip()
-                        if re.match(r"^\d{5,}$", candidate):  # At least 5 digits
-                            return candidate
-                        if re.match(r"^[A-Z]{2,}\d{3,}$", candidate):  # Mix of letters and numbers
-                            return candidate
-        
+        n = len(values)
+        for idx in positions.get("invoice_number", ()):
+            # Check next few lines for potential invoice numbers
+            for offset in range(1, 4):
+                if idx + offset < n:
+                    candidate = values[idx + offset].strip()
+                    if _DIGITS5_ONLY_RE.match(candidate):  # At least 5 digits
+                        return candidate
+                    if _ALPHA_NUM_CODE_RE.match(candidate):  # Mix of letters and numbers
+                        return candidate
+
         # Fallback: look for any invoice-like code in the document
-        for line in lines:
-            if self._is_invoice_code(line["value"]):
-                return line["value"].strip()
-        
+        for value in values:
+            if self._is_invoice_code(value):
+                return value.strip()
+
         return None
 
     def _is_invoice_code(self, text: str) -> bool:
+        # One character walk instead of five regex calls per candidate;
+        # the charset test rejects dollar amounts, slashed dates and
+        # formatted phone numbers for free, so the date/phone patterns
+        # only run on the dashed strings that could still be either
         text = text.strip()
-        if len(text) < 5:
-            return False
-        if re.search(r"\d{1,2}[/-]\d{1,2}[/-]\d{2,4}", text):
+        n = len(text)
+        if n < 5:
             return False
-        if re.search(r"\$\d+", text):
+        digits = 0
+        dashes = 0
+        for c in text:
+            if c.isdigit():
+                digits += 1
+            elif c == "-":
+                dashes += 1
+            elif not ("A" <= c <= "Z"):
+                return False
+        if digits == n == 10:  # bare 10-digit phone number
             return False
-        if re.match(r"^(\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4})$", text):
+        if dashes and (_DATE_ANY_RE.search(text) or _PHONE_FMT_RE.match(text)):
             return False
-        if re.match(r"^\d{10}$", text):
-            return False
-        return bool(re.match(r"^[A-Z0-9\-]{5,}$", text))
-
-    def extract_value(self, lines: List[Dict[str, str]], label: str) -> Optional[str]:
-        for line in lines:
-            if line["label"] == label:
-                parts = line["value"].split()
-                for p in parts[::-1]:
-                    if re.match(r"[A-Z0-9\-]{4,}", p):
-                        return p
-                return line["value"]
+        return True
+
+    def extract_value(self, values: List[str], positions: Dict[str, List[int]], label: str) -> Optional[str]:
+        for idx in positions.get(label, ()):
+            parts = values[idx].split()
+            for p in parts[::-1]:
+                if _TOKEN_RE.match(p):
+                    return p
+            return values[idx]
         return None
 
-    def extract_value_near(self, lines: List[Dict[str, str]], label: str) -> Optional[str]:
-        for idx, line in enumerate(lines):
-            if line["label"] == label:
-                for offset in range(1, 4):
-                    if idx + offset < len(lines):
-                        candidate = lines[idx + offset]["value"]
-                        match = re.search(r"[A-Z0-9]{5,}", candidate)
-                        if match:
-                            return match.group()
+    def extract_value_near(self, values: List[str], positions: Dict[str, List[int]], label: str) -> Optional[str]:
+        n = len(values)
+        for idx in positions.get(label, ()):
+            for offset in range(1, 4):
+                if idx + offset < n:
+                    match = _CODE5_RE.search(values[idx + offset])
+                    if match:
+                        return match.group()
         return None
 
-    def extract_date(self, lines: List[Dict[str, str]], label: str) -> Optional[str]:
-        for line in lines:
-            if line["label"] == label:
-                try:
-                    return parse_date(line["value"], fuzzy=True).strftime("%Y-%m-%d")
-                except:
-                    continue
-        for line in lines:
-            match = re.search(r"\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b", line["value"])
+    def extract_date(self, values: List[str], positions: Dict[str, List[int]], label: str) -> Optional[str]:
+        for idx in positions.get(label, ()):
+            try:
+                return _fast_parse_date(values[idx]).strftime("%Y-%m-%d")
+            except:
+                continue
+        for value in values:
+            match = _DATE_RE.search(value)
             if match:
                 try:
-                    return parse_date(match.group(), fuzzy=True).strftime("%Y-%m-%d")
+                    return _fast_parse_date(match.group()).strftime("%Y-%m-%d")
                 except:
                     continue
         return None
 
-    def extract_amount_due(self, lines: List[Dict[str, str]]) -> Optional[float]:
+    def extract_amount_due(self, values: List[str], positions: Dict[str, List[int]]) -> Optional[float]:
         # Look for amount near "Amount Due" label
-        for idx, line in enumerate(lines):
-            if line["label"] == "amount_due":
-                # Check next few lines for currency amounts
-                for offset in range(1, 4):
-                    if idx + offset < len(lines):
-                        amount_str = lines[idx + offset]["value"]
-                        match = re.search(r"[\$JMD]*[\s]*([\d,]+\.\d{2})", amount_str)
-                        if match:
-                            try:
-                                return float(match.group(1).replace(",", ""))
-                            except:
-                                continue
+        n = len(values)
+        for idx in positions.get("amount_due", ()):
+            # Check next few lines for currency amounts
+            for offset in range(1, 4):
+                if idx + offset < n:
+                    amount = _parse_amount(values[idx + offset])
+                    if amount is not None:
+                        return amount
         return None
 
-    def extract_currency_near(self, lines: List[Dict[str, str]], label: str) -> Optional[float]:
-        for idx, line in enumerate(lines):
-            if line["label"] == label:
-                for lookahead in range(1, 3):
-                    if idx + lookahead < len(lines):
-                        target = lines[idx + lookahead]["value"]
-                        match = re.search(r"[\$JMD]*[\s]*([\d,]+\.\d{2})", target)
-                        if match:
-                            try:
-                                return float(match.group(1).replace(",", ""))
-                            except:
-                                continue
+    def extract_currency_near(self, values: List[str], positions: Dict[str, List[int]], label: str) -> Optional[float]:
+        n = len(values)
+        for idx in positions.get(label, ()):
+            for lookahead in range(1, 3):
+                if idx + lookahead < n:
+                    amount = _parse_amount(values[idx + lookahead])
+                    if amount is not None:
+                        return amount
         return None
 
-    def extract_items(self, lines: List[str]) -> List[Dict[str, Any]]:
+    def extract_items(self, lines: List[str], ocr_text: Optional[str] = None) -> List[Dict[str, Any]]:
         items = []
-        item_pattern = re.compile(
-            r"(?P<desc>.+?)\s+"  # Description
-            r"(?P<rate>\$\d+,\d+\.\d{2})\s+"  # Rate
-            r"(?:\+15\%\s+)?"  # Optional tax indicator
-            r"(?P<qty>\d+)\s+"  # Quantity
-            r"(?P<total>\$\d+,\d+\.\d{2})"  # Total
-        )
-        
-        for line in lines:
-            match = item_pattern.search(line)
-            if match:
-                items.append({
-                    "description": match.group("desc").strip(),
-                    "unit_price": float(match.group("rate").replace("$", "").replace(",", "")),
-                    "quantity": int(match.group("qty")),
-                    "amount": float(match.group("total").replace("$", "").replace(",", ""))
-                })
+        # One C-level finditer over the whole document beats a Python
+        # search call per line; the \s+ between groups also spans
+        # newlines, catching items the OCR engine wrapped across lines
+        # A dollar sign is a mandatory literal in the pattern, so a C
+        # substring check screens out unpriced text before the engine runs
+        if ocr_text is not None:
+            matches = _ITEM_RE.finditer(ocr_text) if "$" in ocr_text else ()
+        else:
+            matches = (m for line in lines if "$" in line and (m := _ITEM_RE.search(line)))
+        for match in matches:
+            items.append({
+                "description": match.group("desc").strip(),
+                "unit_price": float(match.group("rate").replace("$", "").replace(",", "")),
+                "quantity": int(match.group("qty")),
+                "amount": float(match.group("total").replace("$", "").replace(",", ""))
+            })
         
         # Fallback for simpler item formats
         if not items:
             for idx, line in enumerate(lines):
-                if re.search(r"\$\d{1,3}(?:,\d{3})*\.\d{2}", line):
-                    amount = float(re.sub(r"[^\d.]", "", line))
+                if "$" in line and _AMOUNT_RE.search(line):
+                    amount = float(_NON_NUMERIC_RE.sub("", line))
                     description = ""
                     qty = 1
                     if idx > 0:
                         description = lines[idx - 1].strip()
                     if idx + 2 < len(lines):
-                        if re.match(r"\d+$", lines[idx + 2]):
+                        if _INT_ONLY_RE.match(lines[idx + 2]):
                             qty = int(lines[idx + 2])
                     items.append({
                         "description": description,
@@ -578,50 +417,174 @@ class InvoiceParser:
                     })
         return items
 
-    def parse_vendor_info(self, lines: List[str]) -> Dict[str, Any]:
+    def parse_vendor_info(
+        self,
+        lines: List[str],
+        lowers: Optional[List[str]] = None,
+        emails: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
         vendor = {
             "name": None,
             "address": None,
-            "email": None,
+            "email": emails[0] if emails else None,
             "phone": None
         }
         
-        # Look for vendor name in first few lines
-        for line in lines[:5]:
-            if re.search(r"(limited|llc|inc|corp|company)", line, re.IGNORECASE):
-                vendor["name"] = line.strip()
-                break
-                
-        # Look for address components
+        # One fused-alternation scan per line instead of four separate
+        # searches; the flags reproduce the old independent-match
+        # semantics (name/address/region/phone can all fire on one line)
+        if lowers is None:
+            lowers = [l.lower() for l in lines]
         address_lines = []
-        for line in lines:
-            if re.search(r"\d{1,5}\s+.+(street|ave|road|rd|lane|blvd|drive)", line, re.IGNORECASE):
+        for idx, line in enumerate(lines):
+            name_hit = address_hit = region_hit = False
+            phone_num = None
+            for match in _VENDOR_SCAN_RE.finditer(lowers[idx]):
+                group = match.lastgroup
+                if group == "name":
+                    name_hit = True
+                elif group == "address":
+                    address_hit = True
+                elif group == "region":
+                    region_hit = True
+                elif phone_num is None:
+                    phone_num = match.group("phone")
+            if vendor["name"] is None and idx < 5 and name_hit:
+                vendor["name"] = line.strip()
+            if address_hit:
                 address_lines.append(line.strip())
-            elif re.search(r"kingston|jamaica", line, re.IGNORECASE):
+            elif region_hit:
                 address_lines.append(line.strip())
-        
+            if vendor["phone"] is None and phone_num is not None:
+                vendor["phone"] = phone_num.strip()
+
         vendor["address"] = " ".join(address_lines) if address_lines else None
-        
-        # Extract phone number
-        for line in lines:
-            phone_match = re.search(r"(?:tel|phone):?\s*([\d\-\(\) ]+)", line, re.IGNORECASE)
-            if phone_match:
-                vendor["phone"] = phone_match.group(1).strip()
-                break
-                
         return vendor
 
     def find_currency(self, lines: List[str]) -> Optional[str]:
-        for line in lines:
-            match = re.search(self.CURRENCY_PATTERN, line)
-            if match:
-                return match.group()
+        # Pure literal alternation: str.find's C substring search beats
+        # entering the regex engine, and one joined scan beats a search
+        # call per line. Each token is scanned to its first word-bounded
+        # hit and the earliest position wins, preserving the baseline's
+        # document-order semantics rather than token priority
+        text = "\n".join(lines)
+        best_pos = -1
+        best_currency = None
+        for currency in ("USD", "JMD", "EUR", "GBP"):
+            pos = text.find(currency)
+            while pos != -1:
+                if best_pos != -1 and pos >= best_pos:
+                    break
+                before = text[pos - 1] if pos > 0 else " "
+                end = pos + len(currency)
+                after = text[end] if end < len(text) else " "
+                if not before.isalnum() and not after.isalnum():
+                    best_pos = pos
+                    best_currency = currency
+                    break
+                pos = text.find(currency, end)
+        return best_currency
+
+    @classmethod
+    def cache_clear(cls) -> None:
+        with cls._parse_cache_lock:
+            cls._parse_cache.clear()
+
+def _classify_kernel(
+    lines: List[str], lowers: List[str]
+) -> Tuple[List[str], List[str], Dict[str, List[int]]]:
+    """Hot inner loop of classify_lines as a module-level pure function.
+
+    No self, no attribute lookups: everything the loop touches is bound
+    to a local once, so each iteration is plain LOAD_FASTs around the C
+    calls. Kept free of instance state so it could be compiled as-is by
+    mypyc or Cython if the classifier ever needs another gear.
+
+    Returns parallel (labels, values) lists rather than a dict per line:
+    two flat arrays are cheaper to build, lighter to hold and read back
+    by index without a hash probe per field. The positions map records
+    where each label landed, so extractors jump straight to their
+    matches instead of rescanning every line."""
+    automaton = _LABEL_AUTOMATON
+    label_for = _LABEL_CHAIN
+    digits7_search = _DIGITS7_RE.search
+    label_count = len(InvoiceParser._LABEL_ITEMS)
+    top_label = _TOP_LABEL
+    top_prefixes = _TOP_PREFIX_TUPLE
+    labels = []
+    append_label = labels.append
+    positions = {}
+    for idx, (line, lower) in enumerate(zip(lines, lowers)):
+        label = "unknown"
+        if lower.startswith(top_prefixes):
+            # Lines anchored on a top-priority keyword skip the scan
+            # outright: startswith against a constant tuple is one C
+            # call, and rank 0 cannot be outranked anyway
+            label = top_label
+        elif automaton is not None:
+            # One scan per line; the hit with the highest FIELD_LABELS
+            # priority (declaration order) wins, as the old loop did
+            best_rank = label_count
+            for _, (rank, key) in automaton.iter(lower):
+                if rank < best_rank:
+                    best_rank = rank
+                    label = key
+                    if rank == 0:
+                        # Nothing can outrank the top label; stop
+                        # scanning the rest of the line
+                        break
+        else:
+            label = label_for(lower)
+        if not label.startswith("vendor") and digits7_search(line):
+            label = "vendor_phone"
+        append_label(label)
+        if label != "unknown":
+            positions.setdefault(label, []).append(idx)
+    return labels, lines, positions
+
+
+# The highest-priority label's keywords as a startswith() tuple - the
+# common "Invoice Number: ..." header line resolves without entering
+# the automaton or the regex engine at all
+_TOP_LABEL, _TOP_PREFIX_TUPLE = InvoiceParser._LABEL_ITEMS[0]
+
+
+def _build_label_chain():
+    """exec-compile FIELD_LABELS into a straight-line membership chain.
+
+    The table is fixed at import, so instead of re-interpreting it per
+    line the fallback classifier is generated source - one if per label,
+    each keyword an `in` test the compiler turns into C substring
+    searches - with the same declaration-order priority the automaton
+    path uses."""
+    parts = ["def _label_for(l):"]
+    for label, keywords in InvoiceParser._LABEL_ITEMS:
+        condition = " or ".join(f"{keyword!r} in l" for keyword in keywords)
+        parts.append(f"    if {condition}:")
+        parts.append(f"        return {label!r}")
+    parts.append("    return 'unknown'")
+    namespace = {}
+    exec("\n".join(parts), namespace)
+    return namespace["_label_for"]
+
+
+_LABEL_CHAIN = _build_label_chain()
+
+
+def _build_label_automaton():
+    """Compile FIELD_LABELS keywords into one Aho-Corasick automaton so
+    classify_lines scans each line once instead of per keyword"""
+    if ahocorasick is None:
         return None
+    automaton = ahocorasick.Automaton()
+    for rank, (label, keywords) in enumerate(InvoiceParser._LABEL_ITEMS):
+        for keyword in keywords:
+            automaton.add_word(keyword, (rank, label))
+    automaton.make_automaton()
+    return automaton
+
 
-    def _is_filled(self, value: Any) -> bool:
-        if isinstance(value, dict):
-            return any(self._is_filled(v) for v in value.values())
-        return bool(value)
+_LABEL_AUTOMATON = _build_label_automaton()
 
 
 # Example usage:
@@ -1,5 +1,10 @@
 import re
 import json
+import time
+import functools
+import orjson
+import threading
+from collections import OrderedDict
 from typing import List, Dict, Any, Optional, Tuple
 from dateutil.parser import parse as parse_date
 from dataclasses import dataclass, field
@@ -7,6 +12,85 @@ import hashlib
 import sqlite3
 from datetime import datetime
 
+@functools.lru_cache(maxsize=1024)
+def _loads_cached(blob: Optional[str]) -> Any:
+    """orjson.loads memoized on the raw blob text.
+
+    The same template rows are re-read on every matching parse and every
+    listing page, so their blobs decode to identical containers over and
+    over; keying on the text means a rewrite by _save_template misses
+    naturally. Callers share the returned containers and must not mutate
+    them - replace whole attributes instead.
+    """
+    return orjson.loads(blob) if blob else {}
+
+
+try:
+    import ahocorasick
+except ImportError:  # pragma: no cover - optional speedup
+    ahocorasick = None
+
+# Compiled once at import: parse() runs these against every line, and
+# handing string literals to re.search pays the pattern-cache lookup
+# (and an occasional recompile) on every single call
+_RE_DIGIT = re.compile(r'\d')
+_RE_CURRENCY = re.compile(r'[\$\£\€]')
+
+# Structure hashing only needs boolean features per line, and frozenset
+# disjointness is a single C-level membership scan - cheaper than an
+# engine walk for one-character classes
+_DIGIT_SET = frozenset('0123456789')
+_CURR_SET = frozenset('$£€')
+
+_RE_DATE = re.compile(r'(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})')
+_RE_DATE_PARTS = re.compile(r'(\d{1,2})[/-](\d{1,2})[/-](\d{2,4})')
+_RE_INVOICE_CODE = re.compile(r'([A-Z]{2,}\d{3,}|\d{5,})')
+_RE_AMOUNT = re.compile(r'[\$\£\€]?\s*([\d,]+\.\d{2})')
+# Matched against pre-lowercased lines, so the IGNORECASE flag (and its
+# slower case-folding scan) is unnecessary
+_RE_VENDOR_NAME = re.compile(r'(limited|llc|inc|corp|company)\b')
+_RE_ADDRESS = re.compile(r'\d{1,5}\s+.+(street|ave|road|rd|lane|blvd|drive|st)\b')
+_RE_REGION = re.compile(r'(kingston|jamaica)\b')
+_RE_PHONE = re.compile(r'(?:tel|phone|ph)\s*[:]?\s*([\d\-\(\) ]{7,})')
+_RE_CURRENCY_TOKEN = re.compile(r'\b(USD|JMD|EUR|GBP)\b')
+_RE_ITEM_ANCHOR = re.compile(r'(?:description|item|service|qty|quantity|rate|amount)', re.IGNORECASE)
+_RE_MONEY = re.compile(r'\$\d+\.?\d*')
+
+# Item-section signals fused into one scan over the lowercased line: an
+# unnamed header alternative plus a named money group, so one finditer
+# pass classifies the line
+_ITEM_SIG = re.compile(r'(?:description|item|service)\b|(?P<money>\$\d+\.?\d*)')
+_RE_COL_SPLIT = re.compile(r'\s{2,}')
+
+# All field patterns fused into one alternation: a single engine walk
+# per line finds every label, and the matched value group's name says
+# which field it was. due_date sits ahead of issue_date so the bare
+# "date" alternative never claims half of a "due date" label.
+_FIELD_SCAN_RE = re.compile(
+    r'invoice\s*(?:no|number|#)\s*[:]?\s*(?P<invoice_number>[A-Z0-9-]+)'
+    r'|due\s*date\s*[:]?\s*(?P<due_date>\d{1,2}[/-]\d{1,2}[/-]\d{2,4})'
+    r'|(?:date|invoice\s*date|date\s*of\s*issue)\s*[:]?\s*(?P<issue_date>\d{1,2}[/-]\d{1,2}[/-]\d{2,4})'
+    r'|(?:total|amount\s*due|balance\s*due)\s*[:]?\s*(?P<amount_due>[\$\£\€]\s*\d{1,3}(?:,\d{3})*\.\d{2})',
+    re.IGNORECASE
+)
+
+# Every field pattern is anchored on one of these literals, so a line
+# where none of them occurs cannot match any pattern. One automaton pass
+# per line replaces four regex walks on the (typical) lines that carry
+# no labels at all.
+_FIELD_ANCHORS = ("invoice", "date", "due", "total", "amount", "balance")
+
+def _build_anchor_automaton():
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for word in _FIELD_ANCHORS:
+        automaton.add_word(word, word)
+    automaton.make_automaton()
+    return automaton
+
+_ANCHOR_AUTOMATON = _build_anchor_automaton()
+
 @dataclass
 class InvoiceTemplate:
     template_id: str
@@ -14,8 +98,12 @@ class InvoiceTemplate:
     structure_hash: str
     field_positions: Dict[str, Tuple[int, int]]  # field_name: (line_idx, value_offset)
     item_pattern: Dict[str, Any]
-    created_at: str = field(default_factory=lambda: datetime.now().isoformat())
-    last_used: str = field(default_factory=lambda: datetime.now().isoformat())
+    # Integer epoch seconds: one clock read instead of a datetime
+    # object plus strftime-style formatting per template touch. Rows
+    # written before the change carry ISO-8601 text; readers format at
+    # the edge and tolerate both.
+    created_at: int = field(default_factory=lambda: int(time.time()))
+    last_used: int = field(default_factory=lambda: int(time.time()))
     usage_count: int = 1
     fields: Dict[str, Any] = field(default_factory=dict)  # e.g. invoice_number, due_date, etc.
     vendor_details: Dict[str, str] = field(default_factory=dict)  # name, address, phone, email
@@ -23,14 +111,30 @@ class InvoiceTemplate:
     metadata: Dict[str, Any] = field(default_factory=dict)  # e.g. currency, tax, subtotal, etc.
 
 class AdaptiveInvoiceParser:
+    # Most traffic comes from a handful of vendors, so the same template
+    # row is re-fetched and re-deserialized constantly; a small LRU in
+    # front of SQLite turns those repeats into a dict lookup
+    _TPL_CACHE_SIZE = 256
+
     def __init__(self, db_path: str = "invoice_templates.db"):
         self.db_path = db_path
+        # One long-lived connection: connect + pragma setup are paid
+        # once instead of per call, WAL lets route readers run alongside
+        # parse()'s writes, and the lock serializes access across worker
+        # threads (sqlite3 objects aren't safe for concurrent use)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._db_lock = threading.Lock()
         self._init_db()
         self.current_template = None
+        self._tpl_cache: "OrderedDict[Tuple[str, str], InvoiceTemplate]" = OrderedDict()
+        self._tpl_cache_lock = threading.Lock()
 
     def _init_db(self):
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("""
+        with self._db_lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("PRAGMA temp_store=MEMORY")
+            self._conn.execute("""
                 CREATE TABLE IF NOT EXISTS templates (
                     template_id TEXT PRIMARY KEY,
                     vendor_name TEXT,
@@ -46,48 +150,102 @@ class AdaptiveInvoiceParser:
                     metadata TEXT
                 )
             """)
+            # Equality lookups on either key should be index seeks, not
+            # table scans, once the template table grows
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_templates_structure_hash ON templates(structure_hash)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_templates_vendor_name ON templates(vendor_name)"
+            )
+            self._conn.commit()
 
     def _calculate_structure_hash(self, lines: List[str]) -> str:
         """Create a fingerprint of the invoice structure"""
-        structure_features = []
+        # Three bytes per line - length as uint16 plus a feature
+        # bitmask - hashed directly, instead of formatting the features
+        # into a joined string and re-encoding it
+        buf = bytearray()
         for line in lines:
-            # Extract structural features (not content)
-            has_numbers = '1' if re.search(r'\d', line) else '0'
-            has_currency = '1' if re.search(r'[\$\£\€]', line) else '0'
-            has_date = '1' if re.search(r'\d{1,2}[/-]\d{1,2}[/-]\d{2,4}', line) else '0'
-            line_features = f"{len(line)}|{has_numbers}|{has_currency}|{has_date}"
-            structure_features.append(line_features)
-        return hashlib.md5('|'.join(structure_features).encode()).hexdigest()
+            # Structural features only (not content); a line without
+            # digits cannot contain a date, so the one remaining regex
+            # only runs where it can match
+            has_numbers = not _DIGIT_SET.isdisjoint(line)
+            flags = has_numbers
+            if not _CURR_SET.isdisjoint(line):
+                flags |= 2
+            if has_numbers and _RE_DATE.search(line):
+                flags |= 4
+            buf += min(len(line), 0xFFFF).to_bytes(2, 'little')
+            buf.append(flags)
+        # blake2b is both faster than md5 on modern CPUs and not a
+        # deprecated-for-everything digest; 16 bytes keeps hex width down
+        return hashlib.blake2b(bytes(buf), digest_size=16).hexdigest()
 
     def _find_matching_template(self, structure_hash: str, vendor_name: str) -> Optional[InvoiceTemplate]:
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                "SELECT * FROM templates WHERE structure_hash = ? OR vendor_name = ? ORDER BY usage_count DESC LIMIT 1",
-                (structure_hash, vendor_name)  # ✅ supply the 2 values here
+        cache_key = (structure_hash, vendor_name)
+        with self._tpl_cache_lock:
+            template = self._tpl_cache.get(cache_key)
+            if template is not None:
+                self._tpl_cache.move_to_end(cache_key)
+                return template
+
+        with self._db_lock:
+            # UNION ALL of two indexed equality lookups: each leg seeks
+            # its own index, where the OR form leaves the plan up to the
+            # optimizer's OR-union heuristics
+            cursor = self._conn.execute(
+                """
+                SELECT * FROM (
+                    SELECT template_id, vendor_name, structure_hash,
+                           field_positions, item_pattern, created_at,
+                           last_used, usage_count, fields, vendor_details,
+                           customer_details, metadata
+                    FROM templates WHERE structure_hash = ?
+                    UNION ALL
+                    SELECT template_id, vendor_name, structure_hash,
+                           field_positions, item_pattern, created_at,
+                           last_used, usage_count, fields, vendor_details,
+                           customer_details, metadata
+                    FROM templates WHERE vendor_name = ?
+                )
+                ORDER BY usage_count DESC LIMIT 1
+                """,
+                (structure_hash, vendor_name)
             )
             row = cursor.fetchone()
-            if row:
-                return InvoiceTemplate(
-                    template_id=row[0],
-                    vendor_name=row[1],
-                    structure_hash=row[2],
-                    field_positions=json.loads(row[3]),
-                    item_pattern=json.loads(row[4]),
-                    created_at=row[5],
-                    last_used=row[6],
-                    usage_count=row[7],
-                    fields=json.loads(row[8]) if row[8] else {},
-                    vendor_details=json.loads(row[9]) if row[9] else {},
-                    customer_details=json.loads(row[10]) if row[10] else {},
-                    metadata=json.loads(row[11]) if row[11] else {}
-                )
+        if row:
+            template = InvoiceTemplate(
+                template_id=row[0],
+                vendor_name=row[1],
+                structure_hash=row[2],
+                field_positions=_loads_cached(row[3]),
+                item_pattern=_loads_cached(row[4]),
+                created_at=row[5],
+                last_used=row[6],
+                usage_count=row[7],
+                fields=_loads_cached(row[8]),
+                vendor_details=_loads_cached(row[9]),
+                customer_details=_loads_cached(row[10]),
+                metadata=_loads_cached(row[11])
+            )
+            self._tpl_cache_put(cache_key, template)
+            return template
         return None
 
+    def _tpl_cache_put(self, cache_key: Tuple[str, str], template: InvoiceTemplate):
+        with self._tpl_cache_lock:
+            self._tpl_cache[cache_key] = template
+            self._tpl_cache.move_to_end(cache_key)
+            while len(self._tpl_cache) > self._TPL_CACHE_SIZE:
+                self._tpl_cache.popitem(last=False)
+
 
     def _save_template(self, template: InvoiceTemplate):
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute(
+        # Keep the in-memory copy in step with what lands in SQLite
+        self._tpl_cache_put((template.structure_hash, template.vendor_name), template)
+        with self._db_lock:
+            self._conn.execute(
                 """
                 INSERT OR REPLACE INTO templates (
                     template_id,
@@ -108,44 +266,44 @@ class AdaptiveInvoiceParser:
                     template.template_id,
                     template.vendor_name,
                     template.structure_hash,
-                    json.dumps(template.field_positions),
-                    json.dumps(template.item_pattern),
+                    orjson.dumps(template.field_positions).decode(),
+                    orjson.dumps(template.item_pattern).decode(),
                     template.created_at,
                     template.last_used,
                     template.usage_count,
-                    json.dumps(template.fields),
-                    json.dumps(template.vendor_details),
-                    json.dumps(template.customer_details),
-                    json.dumps(template.metadata)
+                    orjson.dumps(template.fields).decode(),
+                    orjson.dumps(template.vendor_details).decode(),
+                    orjson.dumps(template.customer_details).decode(),
+                    orjson.dumps(template.metadata).decode()
                 )
             )
+            self._conn.commit()
 
 
-    def _learn_structure(self, lines: List[str], vendor_name: str) -> InvoiceTemplate:
+    def _learn_structure(self, lines: List[str], vendor_name: str, lowers: Optional[List[str]] = None) -> InvoiceTemplate:
         """Analyze the invoice structure and create a template"""
         structure_hash = self._calculate_structure_hash(lines)
         field_positions = {}
+        if lowers is None:
+            lowers = [line.lower() for line in lines]
         
-        # Common field patterns to look for
-        field_patterns = {
-            'invoice_number': r'invoice\s*(?:no|number|#)\s*[:]?\s*([A-Z0-9-]+)',
-            'issue_date': r'(?:date|invoice\s*date|date\s*of\s*issue)\s*[:]?\s*(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
-            'due_date': r'due\s*date\s*[:]?\s*(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
-            'amount_due': r'(?:total|amount\s*due|balance\s*due)\s*[:]?\s*([\$\£\€]\s*\d{1,3}(?:,\d{3})*\.\d{2})'
-        }
-        
-        # Find positions of important fields
+        # Find positions of important fields; the anchor automaton
+        # filters out lines that cannot match before the fused scan runs
         for line_idx, line in enumerate(lines):
-            for field_name, pattern in field_patterns.items():
-                match = re.search(pattern, line, re.IGNORECASE)
-                if match and field_name not in field_positions:
-                    field_positions[field_name] = (line_idx, match.start(1))
+            if _ANCHOR_AUTOMATON is not None and next(
+                _ANCHOR_AUTOMATON.iter(lowers[line_idx]), None
+            ) is None:
+                continue
+            for match in _FIELD_SCAN_RE.finditer(line):
+                field_name = match.lastgroup
+                if field_name and field_name not in field_positions:
+                    field_positions[field_name] = (line_idx, match.start(field_name))
         
         # Learn item pattern
         item_pattern = self._learn_item_pattern(lines)
         
         template = InvoiceTemplate(
-            template_id=hashlib.md5(f"{vendor_name}_{structure_hash}".encode()).hexdigest(),
+            template_id=hashlib.blake2b(f"{vendor_name}_{structure_hash}".encode(), digest_size=16).hexdigest(),
             vendor_name=vendor_name,
             structure_hash=structure_hash,
             field_positions=field_positions,
@@ -162,11 +320,11 @@ class AdaptiveInvoiceParser:
         
         # Group lines into potential item blocks
         for line in lines:
-            if re.search(r'(?:description|item|service|qty|quantity|rate|amount)', line, re.IGNORECASE):
+            if _RE_ITEM_ANCHOR.search(line):
                 if current_block:
                     item_blocks.append(current_block)
                     current_block = []
-            elif re.search(r'\$\d+\.?\d*', line):
+            elif _RE_MONEY.search(line):
                 current_block.append(line)
         
         if current_block:
@@ -181,14 +339,28 @@ class AdaptiveInvoiceParser:
         if item_blocks:
             # Simple pattern detection - can be enhanced
             first_item = item_blocks[0]
-            if len(first_item) >= 3 and re.search(r'\d+', first_item[-1]):
+            if len(first_item) >= 3 and _RE_DIGIT.search(first_item[-1]):
                 pattern['columns'] = ['description', 'rate', 'quantity', 'amount']
             elif len(first_item) >= 2:
                 pattern['columns'] = ['description', 'amount']
         
         return pattern
 
-    def _extract_using_template(self, lines: List[str], template: InvoiceTemplate) -> Dict[str, Any]:
+    def _touch_template(self, template: InvoiceTemplate):
+        # Narrow usage bump: the full _save_template rewrote all six
+        # serialized blobs per parse just to advance two columns. The
+        # in-memory object (shared with the template cache) still
+        # carries the latest extraction snapshots; they only reach
+        # SQLite when a template is learned or corrected.
+        with self._db_lock:
+            self._conn.execute(
+                "UPDATE templates SET last_used = ?,"
+                " usage_count = usage_count + 1 WHERE template_id = ?",
+                (template.last_used, template.template_id)
+            )
+            self._conn.commit()
+
+    def _extract_using_template(self, lines: List[str], template: InvoiceTemplate, lowers: Optional[List[str]] = None) -> Dict[str, Any]:
         """Extract data from invoice using a learned template"""
         result = {}
         
@@ -204,10 +376,10 @@ class AdaptiveInvoiceParser:
                     result[field_name] = self._extract_currency(line[value_pos:])
         
         # Extract items using learned pattern
-        result['items'] = self._extract_items_using_pattern(lines, template.item_pattern)
+        result['items'] = self._extract_items_using_pattern(lines, template.item_pattern, lowers)
         
         # Update template usage
-        template.last_used = datetime.now().isoformat()
+        template.last_used = int(time.time())
         template.usage_count += 1
         template.fields = {
             'invoice_number': result.get('invoice_number'),
@@ -226,16 +398,21 @@ class AdaptiveInvoiceParser:
             'confidence_score': result.get('_confidence_score'),
             'completeness': result.get('_completeness')
         }
-        self._save_template(template)
+        self._touch_template(template)
         
         
         return result
 
     def parse(self, ocr_text: str) -> Dict[str, Any]:
         lines = [line.strip() for line in ocr_text.split('\n') if line.strip()]
+        # Lowercase once and share: every helper that used IGNORECASE
+        # (or relowercased per line) now reads from this cache
+        lowers = [line.lower() for line in lines]
         
-        # Step 1: Extract vendor name (always needed for learning)
-        vendor_name = self._extract_vendor_name(lines)
+        # Step 1: Header fields in one traversal (vendor name is always
+        # needed for learning)
+        vendor_name, vendor_address, vendor_phone, currency = \
+            self._extract_header_fields(lines, lowers)
         
         # Step 2: Calculate structure hash and look for matching template
         structure_hash = self._calculate_structure_hash(lines)
@@ -244,90 +421,165 @@ class AdaptiveInvoiceParser:
         if template:
             # Use existing template
             self.current_template = template
-            result = self._extract_using_template(lines, template)
+            result = self._extract_using_template(lines, template, lowers)
         else:
             # Learn new template
-            template = self._learn_structure(lines, vendor_name)
+            template = self._learn_structure(lines, vendor_name, lowers)
             self.current_template = template
-            result = self._extract_using_template(lines, template)
+            result = self._extract_using_template(lines, template, lowers)
         
         # Add common fields
         result.update({
             'vendor': {
                 'name': vendor_name,
-                'address': self._extract_vendor_address(lines),
-                'phone': self._extract_vendor_phone(lines),
+                'address': vendor_address,
+                'phone': vendor_phone,
                 'email': None
             },
-            'currency': self._find_currency(lines),
+            'currency': currency,
             '_template_id': template.template_id if template else None
         })
         
         return result
 
+    def _extract_header_fields(
+        self, lines: List[str], lowers: List[str]
+    ) -> Tuple[Optional[str], Optional[str], Optional[str], Optional[str]]:
+        """Vendor name, address, phone and currency in a single pass.
+
+        The per-field helpers each walked the full line list; the scans
+        are independent, so one loop carrying four slots does the same
+        work in a quarter of the traversals.
+        """
+        name = None
+        address_lines = []
+        phone = None
+        currency = None
+        for idx, (line, lower) in enumerate(zip(lines, lowers)):
+            if name is None and idx < 5 and _RE_VENDOR_NAME.search(lower):
+                name = line.strip()
+            if _RE_ADDRESS.search(lower) or _RE_REGION.search(lower):
+                address_lines.append(line.strip())
+            if phone is None:
+                match = _RE_PHONE.search(lower)
+                if match:
+                    phone = match.group(1).strip()
+            if currency is None:
+                # Currency tokens are uppercase by design, so this one
+                # check reads the original line
+                match = _RE_CURRENCY_TOKEN.search(line)
+                if match:
+                    currency = match.group(1)
+        address = ' '.join(address_lines) if address_lines else None
+        return name, address, phone, currency
+
     # Helper extraction methods (similar to previous implementation but refined)
     def _extract_invoice_number(self, text: str) -> Optional[str]:
-        match = re.search(r'([A-Z]{2,}\d{3,}|\d{5,})', text)
+        match = _RE_INVOICE_CODE.search(text)
         return match.group(1) if match else None
 
     def _extract_date(self, text: str) -> Optional[str]:
-        match = re.search(r'(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})', text)
-        if match:
+        match = _RE_DATE_PARTS.search(text)
+        if not match:
+            return None
+        # The regex already pinned the shape down to d/m/y-ish numerics,
+        # so direct construction replaces dateutil's heuristic tokenizer
+        a, b, y = (int(g) for g in match.groups())
+        if y < 100:
+            y += 2000 if y < 69 else 1900
+        # Month-first unless the first number can only be a day
+        month, day = (a, b) if a <= 12 else (b, a)
+        try:
+            return datetime(y, month, day).strftime('%Y-%m-%d')
+        except ValueError:
             try:
-                return parse_date(match.group(1)).strftime('%Y-%m-%d')
-            except:
+                return parse_date(match.group(0)).strftime('%Y-%m-%d')
+            except (ValueError, OverflowError):
                 return None
-        return None
 
     def _extract_currency(self, text: str) -> Optional[float]:
-        match = re.search(r'[\$\£\€]?\s*([\d,]+\.\d{2})', text)
+        # Fast path for the overwhelmingly common shape: optional
+        # currency glyph, then digits/commas, dot, two cents digits.
+        # The checks mirror what the regex would accept (fuzz-verified
+        # equivalent), so anything messier - interleaved glyphs,
+        # trailing text, odd decimals - falls through to the regex
+        s = text.strip()
+        if s and s[0] in '$£€':
+            s = s[1:].lstrip()
+        if s and s[0].isdigit():
+            head, dot, cents = s.rpartition('.')
+            if dot and len(cents) == 2 and cents.isdigit() and '.' not in head:
+                whole = head.replace(',', '')
+                if whole.isdigit():
+                    return float(whole + '.' + cents)
+        match = _RE_AMOUNT.search(text)
         if match:
             try:
                 return float(match.group(1).replace(',', ''))
-            except:
+            except ValueError:
                 return None
         return None
 
-    def _extract_vendor_name(self, lines: List[str]) -> Optional[str]:
-        for line in lines[:5]:
-            if re.search(r'(limited|llc|inc|corp|company)\b', line, re.IGNORECASE):
+    def _extract_vendor_name(self, lines: List[str], lowers: Optional[List[str]] = None) -> Optional[str]:
+        if lowers is None:
+            lowers = [line.lower() for line in lines[:5]]
+        for line, lower in zip(lines[:5], lowers):
+            if _RE_VENDOR_NAME.search(lower):
                 return line.strip()
         return None
 
-    def _extract_vendor_address(self, lines: List[str]) -> Optional[str]:
+    def _extract_vendor_address(self, lines: List[str], lowers: Optional[List[str]] = None) -> Optional[str]:
+        if lowers is None:
+            lowers = [line.lower() for line in lines]
         address_lines = []
-        for line in lines:
-            if re.search(r'\d{1,5}\s+.+(street|ave|road|rd|lane|blvd|drive|st)\b', line, re.IGNORECASE):
+        for line, lower in zip(lines, lowers):
+            if _RE_ADDRESS.search(lower):
                 address_lines.append(line.strip())
-            elif re.search(r'(kingston|jamaica)\b', line, re.IGNORECASE):
+            elif _RE_REGION.search(lower):
                 address_lines.append(line.strip())
         return ' '.join(address_lines) if address_lines else None
 
-    def _extract_vendor_phone(self, lines: List[str]) -> Optional[str]:
-        for line in lines:
-            match = re.search(r'(?:tel|phone|ph)\s*[:]?\s*([\d\-\(\) ]{7,})', line, re.IGNORECASE)
+    def _extract_vendor_phone(self, lines: List[str], lowers: Optional[List[str]] = None) -> Optional[str]:
+        # The captured group is digits and punctuation, which lowercasing
+        # leaves untouched, so matching the lowered line is lossless
+        if lowers is None:
+            lowers = [line.lower() for line in lines]
+        for lower in lowers:
+            match = _RE_PHONE.search(lower)
             if match:
                 return match.group(1).strip()
         return None
 
     def _find_currency(self, lines: List[str]) -> Optional[str]:
         for line in lines:
-            match = re.search(r'\b(USD|JMD|EUR|GBP)\b', line)
+            match = _RE_CURRENCY_TOKEN.search(line)
             if match:
                 return match.group(1)
         return None
 
-    def _extract_items_using_pattern(self, lines: List[str], pattern: Dict[str, Any]) -> List[Dict[str, Any]]:
+    def _extract_items_using_pattern(self, lines: List[str], pattern: Dict[str, Any], lowers: Optional[List[str]] = None) -> List[Dict[str, Any]]:
         items = []
         in_items_section = False
+        if lowers is None:
+            lowers = [line.lower() for line in lines]
         
-        for line in lines:
-            if re.search(r'(?:description|item|service)\b', line, re.IGNORECASE):
+        for line, lower in zip(lines, lowers):
+            # One fused scan: header keywords flip the section flag,
+            # money hits qualify the line - without a second regex pass
+            is_header = False
+            has_money = False
+            for sig in _ITEM_SIG.finditer(lower):
+                if sig.lastgroup == 'money':
+                    has_money = True
+                else:
+                    is_header = True
+                    break
+            if is_header:
                 in_items_section = True
                 continue
                 
-            if in_items_section and re.search(r'\$\d+\.?\d*', line):
-                parts = [p.strip() for p in re.split(r'\s{2,}', line) if p.strip()]
+            if in_items_section and has_money:
+                parts = [p.strip() for p in _RE_COL_SPLIT.split(line) if p.strip()]
                 
                 if len(parts) >= 4 and pattern.get('columns') == ['description', 'rate', 'quantity', 'amount']:
                     items.append({
@@ -348,6 +600,13 @@ class AdaptiveInvoiceParser:
 
 
 # Example usage
+# One parser (and thus one template cache and one WAL connection) per
+# process: the LRU only observes writes made through its own instance,
+# so every module must share this one or a correction saved through the
+# template routes would never reach the cache serving /api/ocr
+adaptive_parser = AdaptiveInvoiceParser()
+
+
 if __name__ == "__main__":
     # Initialize parser (creates database if not exists)
     parser = AdaptiveInvoiceParser()
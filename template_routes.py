@@ -1,14 +1,29 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Dict, Any, Tuple, Optional
 import sqlite3
-import json
+import time
+import orjson
 from datetime import datetime
-from parsers.adaptive_invoice_parser import AdaptiveInvoiceParser, InvoiceTemplate
+from parsers.adaptive_invoice_parser import adaptive_parser, InvoiceTemplate, _loads_cached
 from fastapi import Query
 
 router = APIRouter()
 
+# The process-wide parser instance: corrections saved here must land
+# in the same template cache that serves /api/ocr
+_PARSER = adaptive_parser
+
+def _format_ts(value):
+    # New rows store epoch seconds (read back as digit strings through
+    # the TEXT-declared columns); rows written before the change carry
+    # ISO-8601 text. Render both the same way for the API.
+    if isinstance(value, (int, float)) or (isinstance(value, str) and value.isdigit()):
+        return datetime.fromtimestamp(int(value)).isoformat()
+    return value
+
+
 class TemplateCorrection(BaseModel):
     template_id: str
     field_positions: Dict[str, Tuple[int, int]]
@@ -16,59 +31,127 @@ class TemplateCorrection(BaseModel):
 
 @router.post("/api/v2/templates/update", tags=["Templates"])
 def update_template(correction: TemplateCorrection):
-    parser = AdaptiveInvoiceParser()
-    with sqlite3.connect(parser.db_path) as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM templates WHERE template_id = ?", (correction.template_id,))
-        row = cursor.fetchone()
-        if not row:
-            raise HTTPException(status_code=404, detail="Template not found")
-
-        template = InvoiceTemplate(
-            template_id=row[0],
-            vendor_name=row[1],
-            structure_hash=row[2],
-            field_positions=correction.field_positions,
-            item_pattern=correction.item_pattern or json.loads(row[4]),
-            created_at=row[5],
-            last_used=datetime.now().isoformat(),
-            usage_count=row[7]
+    with _PARSER._db_lock:
+        cursor = _PARSER._conn.execute(
+            "SELECT template_id, vendor_name, structure_hash, field_positions,"
+            " item_pattern, created_at, last_used, usage_count"
+            " FROM templates WHERE template_id = ?",
+            (correction.template_id,)
         )
+        row = cursor.fetchone()
+    if not row:
+        raise HTTPException(status_code=404, detail="Template not found")
+
+    template = InvoiceTemplate(
+        template_id=row[0],
+        vendor_name=row[1],
+        structure_hash=row[2],
+        field_positions=correction.field_positions,
+        item_pattern=correction.item_pattern or _loads_cached(row[4]),
+        created_at=row[5],
+        last_used=int(time.time()),
+        usage_count=row[7]
+    )
 
-        parser._save_template(template)
+    _PARSER._save_template(template)
 
     return {"status": "success", "message": "Template updated", "template_id": correction.template_id}
 
 
 @router.get("/api/v2/templates", tags=["Templates"])
-def list_templates(template_id: Optional[str] = Query(default=None)):
-    parser = AdaptiveInvoiceParser()
-    with sqlite3.connect(parser.db_path) as conn:
-        cursor = conn.cursor()
+def list_templates(
+    template_id: Optional[str] = Query(default=None),
+    limit: int = Query(default=50, ge=1, le=500),
+    offset: int = Query(default=0, ge=0),
+):
+    # Explicit column list keeps the row narrow (the listing never needs
+    # the learned fields/vendor/customer blobs), and pagination stops a
+    # grown table from being JSON-parsed wholesale per call
+    columns = (
+        "template_id, vendor_name, structure_hash, field_positions,"
+        " item_pattern, created_at, last_used, usage_count"
+    )
+    with _PARSER._db_lock:
         if template_id:
-            cursor.execute("SELECT * FROM templates WHERE template_id = ?", (template_id,))
+            cursor = _PARSER._conn.execute(
+                f"SELECT {columns} FROM templates WHERE template_id = ?", (template_id,)
+            )
         else:
-            cursor.execute("SELECT * FROM templates ORDER BY last_used DESC")
+            cursor = _PARSER._conn.execute(
+                f"SELECT {columns} FROM templates ORDER BY last_used DESC LIMIT ? OFFSET ?",
+                (limit, offset)
+            )
 
         rows = cursor.fetchall()
-        if not rows:
-            raise HTTPException(status_code=404, detail="No templates found")
-
-        templates = []
-        for row in rows:
-            templates.append({
-                "template_id": row[0],
-                "vendor_name": row[1],
-                "structure_hash": row[2],
-                "field_positions": json.loads(row[3]),
-                "item_pattern": json.loads(row[4]),
-                "created_at": row[5],
-                "last_used": row[6],
-                "usage_count": row[7]
-            })
+    if not rows:
+        raise HTTPException(status_code=404, detail="No templates found")
+
+    templates = []
+    for row in rows:
+        templates.append({
+            "template_id": row[0],
+            "vendor_name": row[1],
+            "structure_hash": row[2],
+            # Shared memoized containers - serialized straight back out,
+            # never mutated here
+            "field_positions": _loads_cached(row[3]),
+            "item_pattern": _loads_cached(row[4]),
+            "created_at": _format_ts(row[5]),
+            "last_used": _format_ts(row[6]),
+            "usage_count": row[7]
+        })
 
     return {
         "status": "success",
         "count": len(templates),
         "templates": templates
     }
+
+
+# Batch size for the NDJSON stream: big enough to amortize the lock
+# round-trip, small enough that a chunk never holds much memory
+_STREAM_BATCH = 200
+
+
+@router.get("/api/v2/templates/stream", tags=["Templates"])
+def stream_templates():
+    """Stream every template as newline-delimited JSON.
+
+    The paged JSON endpoint stays for interactive use; bulk consumers
+    (exports, sync jobs) get one row per line here, fetched in batches
+    so memory stays flat however large the table grows. Ordering by
+    template_id keeps the batched offsets stable while rows are being
+    touched concurrently.
+    """
+    columns = (
+        "template_id, vendor_name, structure_hash, field_positions,"
+        " item_pattern, created_at, last_used, usage_count"
+    )
+
+    def generate():
+        offset = 0
+        while True:
+            # Re-query per batch under the lock rather than holding a
+            # cursor open across yields on the shared connection
+            with _PARSER._db_lock:
+                rows = _PARSER._conn.execute(
+                    f"SELECT {columns} FROM templates"
+                    " ORDER BY template_id LIMIT ? OFFSET ?",
+                    (_STREAM_BATCH, offset)
+                ).fetchall()
+            for row in rows:
+                yield orjson.dumps({
+                    "template_id": row[0],
+                    "vendor_name": row[1],
+                    "structure_hash": row[2],
+                    "field_positions": _loads_cached(row[3]),
+                    "item_pattern": _loads_cached(row[4]),
+                    "created_at": _format_ts(row[5]),
+                    "last_used": _format_ts(row[6]),
+                    "usage_count": row[7]
+                }) + b"\n"
+            if len(rows) < _STREAM_BATCH:
+                break
+            offset += _STREAM_BATCH
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")